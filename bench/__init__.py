@@ -0,0 +1 @@
+"""Benchmarks for main.py; run the modules with python3 -m bench.<name> from the repo root."""
@@ -0,0 +1,134 @@
+"""Generate realistic synthetic ICS calendars for benchmarking.
+
+Usage: python3 -m bench.generate [--events 2000] [--seed 0] [--start YYYY-MM-DD] [-o cal.ics]
+"""
+from datetime import datetime, timedelta
+import argparse
+import random
+
+# VTIMEZONE definitions as Outlook and Google export them
+VTIMEZONES = {
+    'Eastern Standard Time': ('-0500', '-0400', '1SU', '11', '2SU', '3'),
+    'Pacific Standard Time': ('-0800', '-0700', '1SU', '11', '2SU', '3'),
+    'Europe/London': ('+0000', '+0100', '-1SU', '10', '-1SU', '3'),
+}
+
+def vtimezone(tzid: str) -> list:
+    """Build a VTIMEZONE block with yearly standard/daylight rules."""
+    standard, daylight, std_day, std_month, dst_day, dst_month = VTIMEZONES[tzid]
+    return [
+        "BEGIN:VTIMEZONE", f"TZID:{tzid}",
+        "BEGIN:STANDARD", "DTSTART:16010101T020000",
+        f"TZOFFSETFROM:{daylight}", f"TZOFFSETTO:{standard}",
+        f"RRULE:FREQ=YEARLY;BYDAY={std_day};BYMONTH={std_month}", "END:STANDARD",
+        "BEGIN:DAYLIGHT", "DTSTART:16010101T010000",
+        f"TZOFFSETFROM:{standard}", f"TZOFFSETTO:{daylight}",
+        f"RRULE:FREQ=YEARLY;BYDAY={dst_day};BYMONTH={dst_month}", "END:DAYLIGHT",
+        "END:VTIMEZONE",
+    ]
+
+def generate_calendar(events: int = 2000, seed: int = 0, start: datetime = None) -> str:
+    """Return an ICS calendar with roughly the given number of VEVENTs.
+
+    The mix is mostly single meetings spread over a year around start, plus
+    daily and weekly series with EXDATEs, UNTIL and COUNT, RECURRENCE-ID
+    overrides, all-day and multi-day events, UTC, floating and
+    VTIMEZONE-based times, and some FREE or cancelled entries.
+    """
+    rng = random.Random(seed)
+    start = (start or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    tzids = list(VTIMEZONES) + ['America/New_York']
+
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//free//bench//EN", "CALSCALE:GREGORIAN"]
+    for tzid in VTIMEZONES:
+        lines.extend(vtimezone(tzid))
+
+    def stamp(dt, tzid):
+        if tzid == 'UTC':
+            return f":{dt:%Y%m%dT%H%M%S}Z"
+        if tzid is None:
+            return f":{dt:%Y%m%dT%H%M%S}"
+        return f";TZID={tzid}:{dt:%Y%m%dT%H%M%S}"
+
+    def vevent(uid, dtstart, dtend, tzid, *extra):
+        lines.extend(["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{start:%Y%m%dT%H%M%S}Z",
+                      f"SUMMARY:Meeting {uid}", f"DTSTART{stamp(dtstart, tzid)}",
+                      f"DTEND{stamp(dtend, tzid)}", *extra, "END:VEVENT"])
+
+    def meeting_time(day_offset):
+        day = start + timedelta(days=day_offset)
+        begin = day.replace(hour=rng.randint(7, 19), minute=rng.choice((0, 15, 30, 45)))
+        return begin, begin + timedelta(minutes=rng.choice((15, 30, 30, 45, 60, 60, 90, 120)))
+
+    series = max(1, events // 50)
+    for n in range(series):
+        tzid = rng.choice(tzids)
+        # Series started in the past, some long ago
+        begin, end = meeting_time(-rng.choice((7, 30, 180, 720, 2000)))
+        uid = f"series-{n}@bench"
+        if n % 2:
+            rule = "RRULE:FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR"
+        else:
+            days = ",".join(sorted(rng.sample(["MO", "TU", "WE", "TH", "FR"], rng.randint(1, 2))))
+            rule = f"RRULE:FREQ=WEEKLY;INTERVAL={rng.choice((1, 1, 2))};BYDAY={days}"
+        if n % 7 == 3:
+            rule += f";UNTIL={start - timedelta(days=rng.randint(1, 400)):%Y%m%dT%H%M%S}Z"
+        elif n % 7 == 5:
+            rule += f";COUNT={rng.randint(5, 400)}"
+
+        # Cancel a few upcoming occurrences
+        exdates = [begin + timedelta(days=7 * rng.randint(1, 300)) for _ in range(rng.randint(0, 4))]
+        extra = [rule] + [f"EXDATE{stamp(exdate, tzid)}" for exdate in exdates]
+        vevent(uid, begin, end, tzid, *extra)
+
+        # Move a few occurrences (aligned with the weekly cadence of the series start)
+        for _ in range(rng.randint(0, 3)):
+            original = begin + timedelta(days=7 * (((start - begin).days // 7) + rng.randint(0, 40)))
+            moved = original + timedelta(hours=rng.choice((-2, -1, 1, 2, 24)))
+            vevent(uid, moved, moved + (end - begin), tzid,
+                   f"RECURRENCE-ID{stamp(original, tzid)}")
+
+    for n in range(events - series * 2):
+        uid = f"single-{n}@bench"
+        offset = rng.randint(-60, 365)
+        kind = rng.random()
+        if kind < 0.05:
+            # All-day, sometimes multi-day
+            day = start + timedelta(days=offset)
+            lines.extend(["BEGIN:VEVENT", f"UID:{uid}", f"SUMMARY:Out of office {n}",
+                          f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+                          f"DTEND;VALUE=DATE:{day + timedelta(days=rng.choice((1, 1, 2, 5))):%Y%m%d}",
+                          "TRANSP:TRANSPARENT" if rng.random() < 0.3 else "TRANSP:OPAQUE",
+                          "END:VEVENT"])
+            continue
+
+        begin, end = meeting_time(offset)
+        tzid = rng.choice(tzids + ['UTC', None])
+        extra = []
+        if kind > 0.95:
+            extra.append("STATUS:FREE")
+        elif kind > 0.9:
+            extra.append("STATUS:TENTATIVE")
+        vevent(uid, begin, end, tzid, *extra)
+
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic ICS calendar for benchmarking')
+    parser.add_argument('--events', type=int, default=2000, help='Approximate number of VEVENTs (default: 2000)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--start', help='Date the calendar is centred on (format: YYYY-MM-DD, default: today)')
+    parser.add_argument('-o', '--output', help='Write to this file instead of stdout')
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, '%Y-%m-%d') if args.start else None
+    ical_data = generate_calendar(args.events, args.seed, start)
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            f.write(ical_data)
+    else:
+        print(ical_data, end='')
+
+if __name__ == '__main__':
+    main()
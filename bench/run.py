@@ -0,0 +1,124 @@
+"""Time each pipeline stage and the deploy-style workload on synthetic calendars.
+
+Usage: python3 -m bench.run [--events 2000] [--calendars 2] [--repeat 3]
+                            [-o results.json] [--compare baseline.json] [--threshold 0.2]
+
+Stages are timed separately (best of --repeat) for 31, 91 and 365 day
+horizons: parse (parse_calendar over every calendar), find
+(find_free_windows, extended) and format (format_windows in a non-ET
+zone). The deploy stage parses once and writes all 12 timezones in both
+regular (31 days) and extended (91 days) mode, as deploy.sh does.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+from tempfile import TemporaryDirectory
+import argparse
+import json
+import platform
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import main as free
+from bench.generate import generate_calendar
+
+HORIZONS = (31, 91, 365)
+
+def best_of(repeat: int, func):
+    """Return (best wall time in seconds, last result) over repeat calls."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_benchmarks(events: int = 2000, calendars: int = 2, repeat: int = 3, seed: int = 0) -> dict:
+    """Run every stage and return {stage/horizon: seconds}."""
+    et_tz = ZoneInfo("America/New_York")
+    today = datetime.now(et_tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = today - timedelta(days=1)
+    sources = [generate_calendar(events, seed + n, start_date.replace(tzinfo=None)) for n in range(calendars)]
+
+    def parse(days):
+        # Compiled rules are memoized per process; clear them so every run pays the full cost
+        free.compile_rrule.cache_clear()
+        all_events = []
+        for ical_data in sources:
+            all_events.extend(free.parse_calendar(ical_data, start_date=start_date, days=days))
+        return all_events
+
+    results = {}
+    for days in HORIZONS:
+        results[f"parse/{days}"], all_events = best_of(repeat, lambda: parse(days))
+        results[f"find/{days}"], windows = best_of(repeat, lambda: free.find_free_windows(
+            all_events, start_date=start_date, days=days, extended=True))
+        results[f"format/{days}"], _ = best_of(repeat, lambda: free.format_windows(windows, target_tz='Asia/Tokyo'))
+
+    def deploy():
+        with TemporaryDirectory() as tmp_dir:
+            window_args = dict(start_date=start_date)
+            modes = {'': dict(window_args, extended=False, days=31),
+                     'ext': dict(window_args, extended=True, days=91)}
+            free.write_outputs(parse(91), f"{tmp_dir}/out", free.DEFAULT_TIMEZONES, modes)
+
+    results["deploy/24"], _ = best_of(repeat, deploy)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print each stage against the baseline; return False if any slowed down past threshold."""
+    ok = True
+    print(f"{'Stage':<12} {'Baseline':>10} {'Current':>10} {'Ratio':>7}")
+    print("-" * 42)
+    for stage, seconds in results.items():
+        if stage not in baseline:
+            print(f"{stage:<12} {'-':>10} {seconds * 1000:>8.1f}ms {'-':>7}")
+            continue
+        ratio = seconds / baseline[stage] if baseline[stage] else float('inf')
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{stage:<12} {baseline[stage] * 1000:>8.1f}ms {seconds * 1000:>8.1f}ms {ratio:>6.2f}x{flag}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the free pipeline on synthetic calendars')
+    parser.add_argument('--events', type=int, default=2000, help='VEVENTs per calendar (default: 2000)')
+    parser.add_argument('--calendars', type=int, default=2, help='Number of calendars (default: 2)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage; the best is kept (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the calendars (default: 0)')
+    parser.add_argument('-o', '--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown before --compare fails, as a fraction (default: 0.2)')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.events, args.calendars, args.repeat, args.seed)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'events': args.events,
+            'calendars': args.calendars,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'date': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())['results']
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+    else:
+        for stage, seconds in results.items():
+            print(f"{stage:<12} {seconds * 1000:>10.1f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Check that importing main stays cheap, so short CLI runs start fast.
+
+Usage: python3 -m bench.startup [--budget-ms 100] [--repeat 5]
+
+Imports main in a fresh interpreter --repeat times and takes the best
+time. Exits 1 if that exceeds --budget-ms, or if the import pulls in one of
+the heavy modules that should only load on the code path that needs them.
+"""
+from pathlib import Path
+import argparse
+import json
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Deferred to first use in main.py
+HEAVY_MODULES = ('icalendar', 'requests', 'holidays', 'dateutil', 'numpy')
+
+PROBE = f"""
+import json, sys, time
+sys.path.insert(0, {str(ROOT)!r})
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def measure_import(repeat: int = 5) -> dict:
+    """Return the best import time of main in seconds and any heavy modules it loaded."""
+    best = None
+    heavy = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', PROBE], capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+        best = result['seconds'] if best is None else min(best, result['seconds'])
+        heavy.update(result['heavy'])
+    return {'seconds': best, 'heavy': sorted(heavy)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of main.py against a budget')
+    parser.add_argument('--budget-ms', type=float, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    result = measure_import(args.repeat)
+    print(f"import main: {result['seconds'] * 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if result['heavy']:
+        print(f"  imported at startup: {', '.join(result['heavy'])}")
+        failed = True
+    if result['seconds'] * 1000 > args.budget_ms:
+        print("  over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark subtract_busy_times and the numpy backend against the original nested loop.
+
+Usage: python3 bench/subtract.py [--days 365] [--busy 5000] [--repeat 5] [--min-duration 30]
+"""
+from datetime import datetime, timedelta, time
+from pathlib import Path
+from zoneinfo import ZoneInfo
+from timeit import repeat
+import argparse
+import random
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from main import BUSY, epoch, free_runs_numpy, merge_busy_times, subtract_busy_times
+
+def subtract_nested(windows, busy):
+    """The original O(windows * busy) loop from find_free_windows."""
+    result = []
+    for free_start, free_end, is_extended in windows:
+        current = free_start
+        for busy_start, busy_end in busy:
+            if busy_end > current and busy_start < free_end:
+                if current < busy_start:
+                    result.append((current, busy_start, is_extended))
+                current = max(current, busy_end)
+        if current < free_end:
+            result.append((current, free_end, is_extended))
+    return result
+
+def make_workload(days, busy_count, seed=0):
+    """Build extended-mode candidate windows and random busy events over days.
+
+    Events end off the minute, like one ending at 16:00:10, so the engines
+    are also compared on edges between whole minutes.
+    """
+    rng = random.Random(seed)
+    et_tz = ZoneInfo("America/New_York")
+    start = datetime(2026, 1, 1, tzinfo=et_tz)
+
+    windows = []
+    for day in range(days):
+        date = (start + timedelta(days=day)).date()
+        for (h1, h2), is_extended in (((10, 17), False), ((7, 10), True), ((17, 20), True)):
+            windows.append((epoch(datetime.combine(date, time(h1), tzinfo=et_tz)),
+                            epoch(datetime.combine(date, time(h2), tzinfo=et_tz)),
+                            is_extended))
+
+    events = []
+    for _ in range(busy_count):
+        event_start = epoch(start + timedelta(days=rng.randrange(days), minutes=rng.randrange(7 * 60, 20 * 60, 15)))
+        events.append((event_start, event_start + 60 * rng.choice((15, 30, 60, 90)) + rng.randrange(60), BUSY))
+
+    return windows, merge_busy_times(events, buffer_mins=0)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark busy-interval subtraction')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--busy', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-duration', type=int, default=30)
+    args = parser.parse_args()
+
+    windows, busy = make_workload(args.days, args.busy)
+    min_duration_secs = args.min_duration * 60
+
+    def filtered(func):
+        # Include the min_duration filter, which the numpy backend does itself
+        return lambda: [w for w in func(windows, busy) if w[1] - w[0] >= min_duration_secs]
+
+    engines = [('nested', filtered(subtract_nested)), ('bisect', filtered(subtract_busy_times))]
+    try:
+        import numpy
+        engines.append(('numpy', lambda: free_runs_numpy(windows, busy, args.min_duration)))
+    except ImportError:
+        print("numpy not installed, skipping the numpy backend")
+
+    expected = engines[0][1]()
+    print(f"{len(windows)} windows, {len(busy)} merged busy intervals")
+    for name, func in engines:
+        assert func() == expected, f"{name} output differs from nested"
+        best = min(repeat(func, number=1, repeat=args.repeat))
+        print(f"  {name:<8} {best * 1000:10.2f} ms")
+
+if __name__ == '__main__':
+    main()
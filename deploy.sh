@@ -10,7 +10,12 @@ fi
 cd "$(dirname "$0")"
 
 DEPLOY_DIR='deploy'
-CAL_DIR='cal'
+# Outside DEPLOY_DIR so none of them is published
+MANIFEST="$DEPLOY_DIR.manifest.json"
+PENDING="$DEPLOY_DIR.pending"
+DEPLOYED="$DEPLOY_DIR.deployed"
+# Redeploy unchanged windows this often so the checked.txt time stays fresh
+REFRESH_MINS="${REFRESH_MINS:-60}"
 
 if ! grep -q "^EXT_DIR=" .env; then
     echo "EXT_DIR=$(LC_ALL=C base64 </dev/urandom | tr -d '/+=' | head -c 32)" >>.env
@@ -37,14 +42,17 @@ declare -A TIMEZONES=(
 
 mkdir -p "$DEPLOY_DIR"
 mkdir -p "$DEPLOY_DIR/$EXT_DIR"
-mkdir -p "$DEPLOY_DIR/tz"
-mkdir -p "$DEPLOY_DIR/$EXT_DIR/tz"
-mkdir -p "$CAL_DIR"
-rm "$DEPLOY_DIR"/*.html 2>/dev/null
-rm "$DEPLOY_DIR/tz"/* 2>/dev/null
-rm "$DEPLOY_DIR/$EXT_DIR"/*.html 2>/dev/null
-rm "$DEPLOY_DIR/$EXT_DIR/tz"/* 2>/dev/null
-rm "$CAL_DIR"/* 2>/dev/null
+
+# Replace a page only if its contents changed, and mark the site for deploy
+write_page() {
+    cat >"$1.tmp"
+    if cmp -s "$1.tmp" "$1"; then
+        rm "$1.tmp"
+    else
+        mv "$1.tmp" "$1"
+        touch "$PENDING"
+    fi
+}
 
 # Handle calendar downloads for both local and GitHub Actions
 if [[ -n "$GITHUB_ACTIONS" ]]; then
@@ -55,10 +63,9 @@ else
     IFS=' ' read -ra CALENDAR_URLS <<<"$CAL_URLS"
 fi
 
-for CAL_URL in "${CALENDAR_URLS[@]}"; do
-    # Remove any surrounding quotes if present
-    CAL_URL=$(echo "$CAL_URL" | sed -e "s/^['\"]//;s/['\"]$//")
-    wget -P "$CAL_DIR" "$CAL_URL"
+# Remove any surrounding quotes if present; main.py fetches them concurrently
+for i in "${!CALENDAR_URLS[@]}"; do
+    CALENDAR_URLS[$i]=$(echo "${CALENDAR_URLS[$i]}" | sed -e "s/^['\"]//;s/['\"]$//")
 done
 
 source venv/bin/activate
@@ -70,53 +77,27 @@ else
     YESTERDAY=$($(which date) -d 'yesterday' -Idate)
 fi
 
-# Export variables for parallel
-export CAL_FILES=$($(which find) "$CAL_DIR" -type f -name '*.ics*' | tr '\n' ' ')
-export DEPLOY_DIR
-export EXT_DIR
-export YESTERDAY
-
-# Function to generate a single timezone file (called by parallel)
-generate_tz_file() {
-    local tz_abbr="$1"
-    local tz_name="$2"
-    local mode="$3"  # "regular" or "extended"
-
-    # Generate timestamp in this specific timezone
-    local tz_date=$(TZ="$tz_name" date '+cao %e %b @ %l:%M %p')
-
-    if [[ "$mode" == "regular" ]]; then
-        echo "Generating $tz_abbr ($tz_name)..." >&2
-        python3 main.py \
-            -s "$YESTERDAY" \
-            -t "$tz_name" \
-            -f $CAL_FILES | \
-            grep -E '^$|^[A-Za-z]{3} {1,2}[0-9]{1,2} [A-Za-z]{3} @ {1,2}[0-9:]{4,5} [AP]M – {1,2}[0-9:]{4,5} [AP]M [A-Za-z0-9+/_-]{2,32} \(([0-9]{1,2}h)?([0-9]{1,2}m)?\)' \
-            > "$DEPLOY_DIR/tz/${tz_abbr}.txt"
-        echo -e "$tz_date\n\n$(cat $DEPLOY_DIR/tz/${tz_abbr}.txt)" > "$DEPLOY_DIR/tz/${tz_abbr}.txt"
-    else
-        echo "Generating ext-$tz_abbr ($tz_name)..." >&2
-        python3 main.py \
-            -s "$YESTERDAY" \
-            -w \
-            --days 91 \
-            -t "$tz_name" \
-            -f $CAL_FILES | \
-            grep -E '^$|^[A-Za-z]{3} {1,2}[0-9]{1,2} [A-Za-z]{3} @ {1,2}[0-9:]{4,5} [AP]M – {1,2}[0-9:]{4,5} [AP]M [A-Za-z0-9+/_-]{2,32} \(([0-9]{1,2}h)?([0-9]{1,2}m)?\)( {1,4}(morn|even|wknd( (morn|even))?))?' \
-            > "$DEPLOY_DIR/$EXT_DIR/tz/${tz_abbr}.txt"
-        echo -e "$tz_date\n\n$(cat $DEPLOY_DIR/$EXT_DIR/tz/${tz_abbr}.txt)" > "$DEPLOY_DIR/$EXT_DIR/tz/${tz_abbr}.txt"
-    fi
-}
-export -f generate_tz_file
-
-# Generate all timezone files in parallel
-# :::+ links abbr with tz_name (1-to-1), ::: creates product with mode
-parallel -j "${JOBS:-$(nproc)}" generate_tz_file {1} {2} {3} \
-    :::  et              ct              mt              pt               akt               hst              gmt            cet           ist          jst        aet              utc \
-    :::+ America/New_York America/Chicago America/Denver America/Los_Angeles America/Anchorage Pacific/Honolulu Europe/London Europe/Paris Asia/Kolkata Asia/Tokyo Australia/Sydney UTC \
-    ::: regular extended
+# Parse the calendars once and render every timezone in both modes;
+# only files whose windows changed are rewritten (exit status 3 if none)
+python3 main.py \
+    -s "$YESTERDAY" \
+    -u "${CALENDAR_URLS[@]}" \
+    -o "$DEPLOY_DIR" \
+    --modes regular extended \
+    --ext-subdir "$EXT_DIR" \
+    --manifest "$MANIFEST" \
+    --exit-code \
+    --jobs "${JOBS:-$(nproc)}" \
+    --workers "${JOBS:-$(nproc)}"
+status=$?
+if [[ $status -eq 0 ]]; then
+    touch "$PENDING"
+elif [[ $status -ne 3 ]]; then
+    echo "main.py failed with status $status, not deploying" >&2
+    exit "$status"
+fi
 
-cat >"$DEPLOY_DIR/index.html" <<'EOF'
+write_page "$DEPLOY_DIR/index.html" <<'EOF'
 <!DOCTYPE html>
 <html>
 <head>
@@ -228,14 +209,18 @@ cat >"$DEPLOY_DIR/index.html" <<'EOF'
             const content = document.getElementById('content');
             currentTz = tz;
             try {
-                const response = await fetch('tz/' + tz + '.txt');
+                const [response, checkedResponse] = await Promise.all([
+                    fetch('tz/' + tz + '.txt'),
+                    fetch('checked.txt', {cache: 'no-store'})
+                ]);
                 if (!response.ok) throw new Error('Failed to load');
                 const text = await response.text();
 
-                // Split into lines
-                const lines = text.split('\n');
-                const firstLine = lines[0] || '';
-                const restOfContent = lines.slice(1).join('\n');
+                // checked.txt has one "<tz> cao ..." line per timezone
+                const checked = checkedResponse.ok ? await checkedResponse.text() : '';
+                const checkedLine = checked.split('\n').find(line => line.startsWith(tz + ' ')) || '';
+                const firstLine = checkedLine.slice(tz.length + 1);
+                const restOfContent = '\n' + text;
 
                 // Create header with inline dropdown, padded to align with timezone column
                 // Pad to ~33 chars to align with timezone in content lines
@@ -274,7 +259,7 @@ cat >"$DEPLOY_DIR/index.html" <<'EOF'
 </html>
 EOF
 
-cat >"$DEPLOY_DIR/$EXT_DIR/index.html" <<'EOF'
+write_page "$DEPLOY_DIR/$EXT_DIR/index.html" <<'EOF'
 <!DOCTYPE html>
 <html>
 <head>
@@ -457,14 +442,18 @@ cat >"$DEPLOY_DIR/$EXT_DIR/index.html" <<'EOF'
             const content = document.getElementById('content');
             currentTz = tz;
             try {
-                const response = await fetch('tz/' + tz + '.txt');
+                const [response, checkedResponse] = await Promise.all([
+                    fetch('tz/' + tz + '.txt'),
+                    fetch('checked.txt', {cache: 'no-store'})
+                ]);
                 if (!response.ok) throw new Error('Failed to load');
                 const text = await response.text();
 
-                // Split into lines - first line is header, rest is content
-                const lines = text.split('\n');
-                headerLine = lines[0] || '';
-                originalContent = lines.slice(1).join('\n');
+                // checked.txt has one "<tz> cao ..." line per timezone
+                const checked = checkedResponse.ok ? await checkedResponse.text() : '';
+                const checkedLine = checked.split('\n').find(line => line.startsWith(tz + ' ')) || '';
+                headerLine = checkedLine.slice(tz.length + 1);
+                originalContent = '\n' + text;
 
                 // Create header with inline dropdown, padded to align with timezone column
                 // Pad to ~33 chars to align with timezone in content lines
@@ -642,10 +631,17 @@ cat >"$DEPLOY_DIR/$EXT_DIR/index.html" <<'EOF'
 </html>
 EOF
 
+# Nothing changed since the last successful deploy, which is recent enough
+if [[ ! -e "$PENDING" && -e "$DEPLOYED" && -z "$(find "$DEPLOYED" -mmin +"$REFRESH_MINS")" ]]; then
+    echo "No changes, skipping deploy"
+    exit 0
+fi
+
 # Install wrangler if needed
 if ! command -v wrangler &>/dev/null; then
     echo "wrangler not found, installing..." >&2
     npm install -g wrangler
 fi
 
-wrangler pages deploy "$DEPLOY_DIR" --project-name="$PROJECT_NAME"
+# Keep the pending mark if the deploy fails so the next run retries it
+wrangler pages deploy "$DEPLOY_DIR" --project-name="$PROJECT_NAME" && rm -f "$PENDING" && touch "$DEPLOYED"
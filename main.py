@@ -1,18 +1,361 @@
-from datetime import datetime, timedelta, time
-from icalendar import Calendar
+from datetime import datetime, timedelta, time, timezone
 from zoneinfo import ZoneInfo, available_timezones
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Tuple
 import argparse
-import requests
 from pathlib import Path
 import sys
-import holidays
 from operator import itemgetter
+from bisect import bisect_left, bisect_right
+from functools import lru_cache, wraps
+from collections import deque
+from itertools import islice
+import hashlib
+import heapq
+import json
+import os
+import pickle
+from time import perf_counter, gmtime, monotonic, sleep
+from contextlib import redirect_stderr
+import io
+
+# Stage timings and counters collected with --profile; None (and nearly free) otherwise
+PROFILE = None
+
+def profiled(stage: str):
+    """Decorator that adds the wall time and call count of each call to PROFILE[stage]."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if PROFILE is None:
+                return func(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds, calls = PROFILE['stages'].get(stage, (0.0, 0))
+                PROFILE['stages'][stage] = (seconds + perf_counter() - started, calls + 1)
+        return wrapper
+    return decorate
+
+def count(counter: str, n: int = 1) -> None:
+    """Add n to a --profile counter; callers check PROFILE is not None first."""
+    PROFILE['counters'][counter] = PROFILE['counters'].get(counter, 0) + n
+
+def run_profiled(profile: bool, func, *args):
+    """Call func(*args) in a pool worker, returning (result, the worker's PROFILE for this call or None).
+
+    The worker's PROFILE starts empty on every call, since a forked worker
+    inherits the parent's and a spawned one has none.
+    """
+    global PROFILE
+    PROFILE = {'stages': {}, 'counters': {}} if profile else None
+    return func(*args), PROFILE
+
+def merge_profile(profile: dict) -> None:
+    """Add a worker's stage timings and counters (from run_profiled) to PROFILE.
+
+    Stage times from concurrent workers are summed, so they can add up to
+    more than the total wall time.
+    """
+    if PROFILE is None or profile is None:
+        return
+    for stage, (seconds, calls) in profile['stages'].items():
+        total_seconds, total_calls = PROFILE['stages'].get(stage, (0.0, 0))
+        PROFILE['stages'][stage] = (total_seconds + seconds, total_calls + calls)
+    for counter, value in profile['counters'].items():
+        count(counter, value)
+
+def report_profile(path: str = None) -> None:
+    """Write PROFILE as a stderr table, or to path as JSON (or a Prometheus textfile for *.prom)."""
+    stages = PROFILE['stages']
+    counters = PROFILE['counters']
+
+    if path and path.endswith('.prom'):
+        lines = ["# HELP free_stage_seconds Wall time spent in each stage of main.py.",
+                 "# TYPE free_stage_seconds gauge"]
+        lines += [f'free_stage_seconds{{stage="{stage}"}} {seconds:.6f}' for stage, (seconds, _) in stages.items()]
+        lines += ["# HELP free_stage_calls Number of calls to each stage of main.py.",
+                  "# TYPE free_stage_calls gauge"]
+        lines += [f'free_stage_calls{{stage="{stage}"}} {calls}' for stage, (_, calls) in stages.items()]
+        lines += ["# HELP free_count Items processed by main.py.",
+                  "# TYPE free_count gauge"]
+        lines += [f'free_count{{counter="{counter}"}} {value}' for counter, value in counters.items()]
+        Path(path).write_text("\n".join(lines) + "\n")
+    elif path:
+        Path(path).write_text(json.dumps({
+            'stages': {stage: {'seconds': seconds, 'calls': calls} for stage, (seconds, calls) in stages.items()},
+            'counters': counters,
+        }, indent=2) + "\n")
+    else:
+        print(f"\n{'Stage':<12} {'Seconds':>10} {'Calls':>8}", file=sys.stderr)
+        print("-" * 32, file=sys.stderr)
+        for stage, (seconds, calls) in stages.items():
+            print(f"{stage:<12} {seconds:>10.4f} {calls:>8}", file=sys.stderr)
+        print(f"\n{'Counter':<20} {'Value':>10}", file=sys.stderr)
+        print("-" * 32, file=sys.stderr)
+        for counter, value in counters.items():
+            print(f"{counter:<20} {value:>10}", file=sys.stderr)
+
+def atomic_write(path, data, tmp_dir=None) -> None:
+    """Replace path with data (str or bytes) in one os.replace, so readers never see a partial file.
+
+    The temp file goes in tmp_dir (default: beside path), which must be on
+    the same filesystem, and is removed again if the write fails.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(tmp_dir or path.parent) / f"{path.name}.{os.getpid()}.tmp"
+    try:
+        if isinstance(data, str):
+            tmp_path.write_text(data)
+        else:
+            tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
-def parse_calendar(ical_data: str, verbose: bool = False, start_date: datetime = None, days: int = 31) -> List[Tuple[datetime, datetime, str]]:
-    """Parse iCal data and return list of (start, end, status) tuples in ET."""
-    cal = Calendar.from_ical(ical_data)
+def load_pickle(path, what: str):
+    """Unpickle a cache file, or None if it is missing or unreadable (warning about the unreadable what)."""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        print(f"Warning: Ignoring unreadable {what} {path}: {e}", file=sys.stderr)
+        return None
+
+@lru_cache(maxsize=1024)
+def compile_rrule(uid: str, rule_str: str, dtstart: datetime):
+    """Compile an RRULE once per (UID, RRULE, DTSTART) for the life of the process."""
+    from dateutil.rrule import rrulestr
+    return rrulestr(rule_str, dtstart=dtstart, forceset=True)
+
+# Length of one FREQ period, for rules that can be moved forward by whole periods
+PERIOD_LENGTHS = {'WEEKLY': timedelta(weeks=1), 'DAILY': timedelta(days=1), 'HOURLY': timedelta(hours=1),
+                  'MINUTELY': timedelta(minutes=1), 'SECONDLY': timedelta(seconds=1)}
+
+# Rule parts that filter occurrences out, and so can leave a period of that FREQ empty
+FILTER_PARTS = {'WEEKLY': {'BYMONTH', 'BYMONTHDAY', 'BYYEARDAY', 'BYWEEKNO', 'BYSETPOS', 'BYEASTER'}}
+FILTER_PARTS['DAILY'] = FILTER_PARTS['WEEKLY'] | {'BYDAY'}
+FILTER_PARTS['HOURLY'] = FILTER_PARTS['DAILY'] | {'BYHOUR'}
+FILTER_PARTS['MINUTELY'] = FILTER_PARTS['HOURLY'] | {'BYMINUTE'}
+FILTER_PARTS['SECONDLY'] = FILTER_PARTS['MINUTELY'] | {'BYSECOND'}
+
+# Rule parts that leave exactly one occurrence per FREQ period
+PLAIN_PARTS = {'FREQ', 'INTERVAL', 'COUNT', 'WKST'}
+
+def iter_rrule(uid: str,
+               rule,
+               dtstart: datetime,
+               search_start: datetime,
+               cutoff_date: datetime,
+               excluded: set = frozenset(),
+               max_occurrences: int = 20000) -> Iterator[datetime]:
+    """Yield the starts of a recurring event strictly between search_start and cutoff_date, in order.
+
+    Series that ended before search_start (by UNTIL, or by COUNT for rules
+    with a fixed-length FREQ period) are skipped without being compiled.
+    Endless series with a fixed-length period, and COUNT series with one
+    occurrence per period, start generating a couple of periods before
+    search_start instead of at DTSTART (COUNT less the periods skipped), so
+    an old daily meeting costs no more than a new one. Excluded starts
+    (EXDATE and moved RECURRENCE-ID instances) are dropped as they are
+    generated. At most max_occurrences are generated in all, including
+    those before search_start, so a pathological rule such as
+    FREQ=SECONDLY;COUNT=2000000000 cannot run away.
+    """
+    for until in rule.get('UNTIL', []):
+        if not isinstance(until, datetime):
+            until = datetime.combine(until + timedelta(days=1), time(0, 0), tzinfo=dtstart.tzinfo)
+        elif not until.tzinfo:
+            until = until.replace(tzinfo=dtstart.tzinfo)
+        if until < search_start:
+            return
+
+    freq = rule.get('FREQ', [None])[0]
+    interval = rule.get('INTERVAL', [1])[0]
+    if freq in PERIOD_LENGTHS:
+        # Whole periods keep the series in phase; aware arithmetic is wall-clock, like rrule's
+        period = PERIOD_LENGTHS[freq] * interval
+        counts = rule.get('COUNT')
+        periods = (search_start - dtstart) // period - 2
+        if counts:
+            # The n-th occurrence falls within n + 1 periods unless a filter can empty a period
+            if not FILTER_PARTS[freq] & set(rule) and dtstart + period * (counts[0] + 1) + timedelta(days=1) < search_start:
+                return
+            if periods > 0 and not set(rule) - PLAIN_PARTS:
+                # Exactly one occurrence per period, so the skipped ones come off COUNT
+                if counts[0] <= periods:
+                    return
+                from icalendar.prop import vRecur
+                rule = vRecur(rule)
+                rule['COUNT'] = [counts[0] - periods]
+                dtstart = dtstart + period * periods
+        elif periods > 0:
+            dtstart = dtstart + period * periods
+
+    compiled = compile_rrule(uid, rule.to_ical().decode('utf-8'), dtstart)
+    generated = 0
+    for d in compiled:
+        if d >= cutoff_date:
+            break
+        generated += 1
+        if generated > max_occurrences:
+            print(f"[*] stopped expanding after {max_occurrences} occurrences:", uid, file=sys.stderr)
+            break
+        if d > search_start and d not in excluded:
+            yield d
+
+@profiled('expand')
+def expand_rrule(uid: str,
+                 rule,
+                 dtstart: datetime,
+                 search_start: datetime,
+                 cutoff_date: datetime,
+                 excluded: set = frozenset(),
+                 max_occurrences: int = 20000) -> List[datetime]:
+    """Return the starts of a recurring event as a list; see iter_rrule."""
+    dates = list(iter_rrule(uid, rule, dtstart, search_start, cutoff_date, excluded, max_occurrences))
+    if PROFILE is not None:
+        count('occurrences', len(dates))
+    return dates
+
+# Events are (start, end, status) with UTC epoch seconds and a small-int status.
+# Only FREE events are ignored; any status not listed counts as BUSY.
+STATUS_NAMES = ['FREE', 'BUSY', 'TENTATIVE', 'CONFIRMED', 'CANCELLED']
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+FREE = STATUS_CODES['FREE']
+BUSY = STATUS_CODES['BUSY']
+
+def status_code(status: str) -> int:
+    """Intern an iCal STATUS value as its index in STATUS_NAMES."""
+    return STATUS_CODES.get(str(status), BUSY)
+
+def epoch(dt: datetime) -> int:
+    """Whole UTC epoch seconds for an aware datetime."""
+    return int(dt.timestamp())
+
+@profiled('from_ical')
+def read_calendar(ical_data: str) -> 'Calendar':
+    """Build the icalendar component tree."""
+    from icalendar import Calendar
+    return Calendar.from_ical(ical_data)
+
+def localize(dt):
+    """Convert datetimes to ET (floating times are taken as ET); dates pass through."""
+    if isinstance(dt, datetime):
+        if dt.tzinfo:
+            return dt.astimezone(ZoneInfo("America/New_York"))
+        return dt.replace(tzinfo=ZoneInfo("America/New_York"))
+    return dt
+
+def classify_events(cal) -> Tuple[list, list, list]:
+    """Split a calendar's VEVENTs into recurring masters, RECURRENCE-ID overrides and single events in one walk."""
+    masters = []
+    overrides = []
+    singles = []
+    for event in cal.walk('vevent'):
+        if event.get('recurrence-id'):
+            overrides.append(event)
+        elif event.get('rrule'):
+            masters.append(event)
+        else:
+            singles.append(event)
+    if PROFILE is not None:
+        count('vevents', len(masters) + len(overrides) + len(singles))
+    return masters, overrides, singles
+
+def moved_instances_of(overrides: list) -> dict:
+    """Map each UID to the original ET starts that its RECURRENCE-ID overrides replace."""
+    moved_instances = {}
+    for event in overrides:
+        original_date = localize(event.get('recurrence-id').dt)
+        if isinstance(original_date, datetime):
+            moved_instances.setdefault(event.get('uid'), set()).add(original_date)
+    return moved_instances
+
+def event_occurrences(event,
+                      search_start: datetime,
+                      cutoff_date: datetime,
+                      moved_instances: dict,
+                      max_occurrences: int = 20000,
+                      expand=expand_rrule) -> Iterable[Tuple[datetime, datetime, str]]:
+    """Return one VEVENT's (start, end, type) occurrences in ET, in start order.
+
+    expand is expand_rrule, or iter_rrule to generate a series lazily.
+    """
+    et_tz = ZoneInfo("America/New_York")
+
+    # Skip broken events
+    if not event.get('dtend'):
+        print("[*] no dtend:", event.get('uid'), file=sys.stderr)
+        return []
+
+    # Get start and end times
+    start = event.get('dtstart').dt
+    end = event.get('dtend').dt
+
+    # Handle all-day events (date objects instead of datetime)
+    if isinstance(start, datetime):
+        # Convert to ET
+        start = localize(start)
+        end = localize(end)
+
+        # Skip events after cutoff date
+        if start > cutoff_date:
+            return []
+
+        # Handle recurring events
+        if event.get('rrule'):
+            rule = event.get('rrule')
+            if isinstance(rule, dict):
+                # Skip exclusions and dates that correspond to moved instances
+                excluded = set(moved_instances.get(event.get('uid'), ()))
+                exdates = event.get('exdate')
+                if exdates:
+                    if not isinstance(exdates, list):
+                        exdates = [exdates]
+                    for exdate in exdates:
+                        if hasattr(exdate, 'dts'):
+                            for dt in exdate.dts:
+                                # Convert exclusion dates to ET
+                                ex_dt = dt.dt
+                                if isinstance(ex_dt, datetime):
+                                    excluded.add(localize(ex_dt))
+
+                dates = expand(event.get('uid'), rule, start, search_start, cutoff_date,
+                               excluded, max_occurrences)
+                duration = end - start
+                return ((d, d + duration, 'recurring') for d in dates)
+        elif start >= search_start and start <= cutoff_date:
+            # Single event
+            return [(start, end, 'single')]
+    else:  # Handle all-day events
+        # Convert date to datetime at start of day
+        start = datetime.combine(start, time(0, 0), tzinfo=et_tz)
+        end = datetime.combine(end, time(0, 0), tzinfo=et_tz)
+
+        if start >= search_start and start <= cutoff_date:
+            return [(start, end, 'all-day')]
+    return []
+
+@profiled('parse')
+def parse_calendar(ical_data: str, verbose: bool = False, start_date: datetime = None, days: int = 31,
+                   holiday_country: str = 'US', holiday_subdiv: str = None, holiday_cache_dir: str = None,
+                   max_occurrences: int = 20000,
+                   max_calendar_occurrences: int = 200000) -> List[Tuple[int, int, int]]:
+    """Parse iCal data and return list of (start, end, status) epoch tuples.
+
+    Times are expanded in ET and stored as UTC epoch seconds; status is a
+    STATUS_CODES value.
+
+    Each recurring event generates at most max_occurrences starts, and the
+    calendar as a whole yields at most max_calendar_occurrences events.
+    """
+    cal = read_calendar(ical_data)
     events = []
+    # Debug records (with summaries) are only built when they will be printed
     debug_events = []
     et_tz = ZoneInfo("America/New_York")
 
@@ -20,201 +363,58 @@ def parse_calendar(ical_data: str, verbose: bool = False, start_date: datetime =
     search_start = start_date if start_date else datetime.now(et_tz)
     cutoff_date = search_start + timedelta(days=days)
 
-    # Track moved instances by their UID and original date
-    moved_instances = {}
+    # Single walk: classify every component as a master, override or single event
+    masters, overrides, singles = classify_events(cal)
 
-    # First pass: collect all moved instances
-    for event in cal.walk('vevent'):
-        recurrence_id = event.get('recurrence-id')
-        if recurrence_id:
-            uid = event.get('uid')
-            # Store the original date for this moved instance
-            if uid not in moved_instances:
-                moved_instances[uid] = set()
-            # Convert to ET for consistency
-            original_date = recurrence_id.dt
-            if isinstance(original_date, datetime):
-                if original_date.tzinfo:
-                    original_date = original_date.astimezone(et_tz)
-                else:
-                    original_date = original_date.replace(tzinfo=et_tz)
-                moved_instances[uid].add(original_date)
-
-    # Track modified events for table display
-    modified_events = []
-
-    for event in cal.walk('vevent'):
-        # Add debug printing for recurring event modifications
-        recurrence_id = event.get('recurrence-id')
-        if recurrence_id and verbose:
-            # Convert recurrence_id to Eastern Time for display
-            original_date = recurrence_id.dt
-            if isinstance(original_date, datetime):
-                if original_date.tzinfo:
-                    original_date = original_date.astimezone(et_tz)
-                else:
-                    original_date = original_date.replace(tzinfo=et_tz)
-
-            # Convert start time to Eastern Time for display
-            event_start = event.get('dtstart').dt
-            if isinstance(event_start, datetime):
-                if event_start.tzinfo:
-                    event_start = event_start.astimezone(et_tz)
-                else:
-                    event_start = event_start.replace(tzinfo=et_tz)
-
-            # Store for table display
-            modified_events.append((
-                original_date,
-                event_start,
-                event.get('uid')
-            ))
-
-    for event in cal.walk('vevent'):
-        # Add debug printing for recurring event modifications
-        recurrence_id = event.get('recurrence-id')
-        if recurrence_id and verbose:
-            # Convert recurrence_id to Eastern Time for display
-            original_date = recurrence_id.dt
-            if isinstance(original_date, datetime):
-                if original_date.tzinfo:
-                    original_date = original_date.astimezone(et_tz)
-                else:
-                    original_date = original_date.replace(tzinfo=et_tz)
-
-            # Convert start time to Eastern Time for display
-            event_start = event.get('dtstart').dt
-            if isinstance(event_start, datetime):
-                if event_start.tzinfo:
-                    event_start = event_start.astimezone(et_tz)
-                else:
-                    event_start = event_start.replace(tzinfo=et_tz)
+    # Resolve overrides: track moved instances by their UID and original date
+    moved_instances = moved_instances_of(overrides)
 
+    if verbose:
+        # Track modified events for table display
+        modified_events = []
+        for event in overrides:
+            uid = event.get('uid')
+            original_date = localize(event.get('recurrence-id').dt)
+            event_start = localize(event.get('dtstart').dt)
+            modified_events.append((original_date, event_start, uid))
             print(f"Modified occurrence found:", file=sys.stderr)
             print(f"  Original date: {original_date}", file=sys.stderr)
-            print(f"  Event ID: {event.get('uid')}", file=sys.stderr)
+            print(f"  Event ID: {uid}", file=sys.stderr)
             print(f"  New time: {event_start}", file=sys.stderr)
 
-        # Skip broken events
-        if not event.get('dtend'):
-            print("[*] no dtend:", event.get('uid'), file=sys.stderr)
-            continue
-
-        # Get start and end times
-        start = event.get('dtstart').dt
-        end = event.get('dtend').dt
-        event_id = event.get('uid', 'NO-UID')
+    # Overrides are concrete occurrences themselves, so they expand like any other event
+    for event in singles + overrides + masters:
+        status = event.get('status', 'BUSY')
+        code = status_code(status)
+        occurrences = list(event_occurrences(event, search_start, cutoff_date, moved_instances, max_occurrences))
 
-        # Handle all-day events (date objects instead of datetime)
-        if isinstance(start, datetime):
-            # Convert to ET
-            if start.tzinfo:
-                start = start.astimezone(et_tz)
-            else:
-                start = start.replace(tzinfo=et_tz)
+        if len(events) + len(occurrences) > max_calendar_occurrences:
+            print(f"[*] occurrence budget of {max_calendar_occurrences} reached at:", event.get('uid'), file=sys.stderr)
+            occurrences = occurrences[:max_calendar_occurrences - len(events)]
 
-            if end.tzinfo:
-                end = end.astimezone(et_tz)
-            else:
-                end = end.replace(tzinfo=et_tz)
-
-            # Skip events after cutoff date
-            if start > cutoff_date:
-                continue
-
-            # Handle recurring events
-            if event.get('rrule'):
-                rule = event.get('rrule')
-                if isinstance(rule, dict):
-                    # Get the rule string and explicitly set TZID
-                    rule_str = event.get('rrule').to_ical().decode('utf-8')
-
-                    # Create a new start time in ET for rrule
-                    start_et = start.astimezone(et_tz)
-
-                    # Use dateutil.rrule with explicit timezone handling
-                    from dateutil.rrule import rrulestr
-                    dates = list(rrulestr(rule_str, dtstart=start_et, forceset=True).between(
-                        search_start,
-                        cutoff_date
-                    ))
-
-                    # Handle exclusions
-                    exdates = event.get('exdate')
-                    if exdates:
-                        if not isinstance(exdates, list):
-                            exdates = [exdates]
-                        excluded = set()
-                        for exdate in exdates:
-                            if hasattr(exdate, 'dts'):
-                                for dt in exdate.dts:
-                                    # Convert exclusion dates to ET
-                                    ex_dt = dt.dt
-                                    if isinstance(ex_dt, datetime):
-                                        if ex_dt.tzinfo:
-                                            ex_dt = ex_dt.astimezone(et_tz)
-                                        else:
-                                            ex_dt = ex_dt.replace(tzinfo=et_tz)
-                                        excluded.add(ex_dt)
-                        dates = [d for d in dates if d not in excluded]
-
-                    # Filter out any dates that correspond to moved instances
-                    uid = event.get('uid')
-                    if uid in moved_instances:
-                        dates = [d for d in dates if d not in moved_instances[uid]]
-
-                    for d in dates:
-                        event_start = d
-                        event_end = d + (end - start)
-                        debug_events.append((
-                            event_start,
-                            event_end,
-                            event.get('summary', 'No title'),
-                            event.get('status', 'BUSY'),
-                            'recurring',
-                            event_id
-                        ))
-                        events.append((event_start, event_end, event.get('status', 'BUSY')))
-            else:
-                # Single event
-                if start >= search_start and start <= cutoff_date:
-                    debug_events.append((
-                        start,
-                        end,
-                        event.get('summary', 'No title'),
-                        event.get('status', 'BUSY'),
-                        'single',
-                        event_id
-                    ))
-                    events.append((start, end, event.get('status', 'BUSY')))
-        else:  # Handle all-day events
-            # Convert date to datetime at start of day
-            start = datetime.combine(start, time(0, 0), tzinfo=et_tz)
-            end = datetime.combine(end, time(0, 0), tzinfo=et_tz)
-
-            # Skip events after cutoff date
-            if start > cutoff_date:
-                continue
-
-            if start >= search_start and start <= cutoff_date:
+        for event_start, event_end, event_type in occurrences:
+            events.append((epoch(event_start), epoch(event_end), code))
+            if verbose:
                 debug_events.append((
-                    start,
-                    end,
+                    event_start,
+                    event_end,
                     event.get('summary', 'No title'),
-                    event.get('status', 'BUSY'),
-                    'all-day',
-                    event_id
+                    status,
+                    event_type,
+                    event.get('uid', 'NO-UID')
                 ))
-                events.append((start, end, event.get('status', 'BUSY')))
+
+        if len(events) >= max_calendar_occurrences:
+            break
 
     # Before sorting debug_events, add holidays
     if verbose:
         et_tz = ZoneInfo("America/New_York")
         now = datetime.now(et_tz)
         end_date = now + timedelta(days=days)
-        us_holidays_list = get_us_holidays(now, end_date)
+        holidays_list = get_holidays(now, end_date, holiday_country, holiday_subdiv, holiday_cache_dir)
 
-        for holiday_date, holiday_name in us_holidays_list:
+        for holiday_date, holiday_name in holidays_list:
             # Add full-day holiday events to debug output
             debug_events.append((
                 holiday_date,
@@ -225,11 +425,11 @@ def parse_calendar(ical_data: str, verbose: bool = False, start_date: datetime =
                 holiday_name  # Show holiday name in ID column
             ))
 
-    # Sort by start time first
-    debug_events.sort(key=lambda x: x[0])
-
     # Only print debug table if verbose
     if verbose:
+        # Sort by start time first
+        debug_events.sort(key=lambda x: x[0])
+
         # Print modified events table first if there are any modifications
         if modified_events:
             print("\nModified Recurring Events:", file=sys.stderr)
@@ -266,24 +466,73 @@ def parse_calendar(ical_data: str, verbose: bool = False, start_date: datetime =
 
     return events
 
-def get_us_holidays(start_date: datetime, end_date: datetime) -> List[Tuple[datetime, str]]:
-    """Get list of US federal holidays between start and end date with their names."""
-    us_holidays = holidays.US()
+def iter_calendar(ical_data: str, start_date: datetime = None, days: int = 31,
+                  max_occurrences: int = 20000,
+                  max_calendar_occurrences: int = 200000) -> Iterator[Tuple[int, int, int]]:
+    """Yield the same events as parse_calendar, but lazily and in start order.
+
+    Recurring events expand as they are consumed and are merged with the
+    (sorted) single events by start, so beyond the component tree only one
+    pending occurrence per series is held at a time.
+    """
+    cal = read_calendar(ical_data)
+    et_tz = ZoneInfo("America/New_York")
+    search_start = start_date if start_date else datetime.now(et_tz)
+    cutoff_date = search_start + timedelta(days=days)
+
+    masters, overrides, singles = classify_events(cal)
+    moved_instances = moved_instances_of(overrides)
+
+    def occurrences(event):
+        code = status_code(event.get('status', 'BUSY'))
+        for event_start, event_end, _ in event_occurrences(event, search_start, cutoff_date, moved_instances,
+                                                           max_occurrences, expand=iter_rrule):
+            yield epoch(event_start), epoch(event_end), code
+
+    one_off = sorted(occurrence for event in singles + overrides for occurrence in occurrences(event))
+    for n, occurrence in enumerate(heapq.merge(one_off, *(occurrences(event) for event in masters))):
+        if n >= max_calendar_occurrences:
+            print(f"[*] occurrence budget of {max_calendar_occurrences} reached", file=sys.stderr)
+            return
+        yield occurrence
+
+@lru_cache(maxsize=None)
+def holidays_for_year(year: int, country: str = 'US', subdiv: str = None, cache_dir: str = None) -> dict:
+    """Return {date: name} for one year of holidays, built once per process and cached on disk in cache_dir."""
+    path = None
+    if cache_dir:
+        path = Path(cache_dir) / f"{country}-{subdiv or ''}-{year}.pickle"
+        table = load_pickle(path, "holiday cache")
+        if table is not None:
+            return table
+
+    import holidays
+    table = dict(holidays.country_holidays(country, subdiv=subdiv, years=year))
+
+    if path:
+        atomic_write(path, pickle.dumps(table, protocol=pickle.HIGHEST_PROTOCOL))
+
+    return table
+
+@profiled('holidays')
+def get_holidays(start_date: datetime, end_date: datetime, country: str = 'US', subdiv: str = None,
+                 cache_dir: str = None) -> List[Tuple[datetime, str]]:
+    """Get list of public holidays between start and end date with their names (tables cached in cache_dir)."""
     holidays_list = []
+    first, last = start_date.date(), end_date.date()
 
-    current = start_date
-    while current <= end_date:
-        if current.date() in us_holidays:
-            # Convert date to datetime at start of day and include holiday name
-            holiday = current.replace(hour=0, minute=0, second=0, microsecond=0)
-            holiday_name = us_holidays.get(current.date())
-            holidays_list.append((holiday, holiday_name))
-        current += timedelta(days=1)
+    for year in range(first.year, last.year + 1):
+        for holiday_date, holiday_name in sorted(holidays_for_year(year, country, subdiv, cache_dir).items()):
+            if first <= holiday_date <= last:
+                # Convert date to datetime at start of day and include holiday name
+                holiday = datetime.combine(holiday_date, time(0, 0), tzinfo=start_date.tzinfo)
+                holidays_list.append((holiday, holiday_name))
 
     return holidays_list
 
-def parse_busy_file(file_path: str) -> List[Tuple[datetime, datetime, str]]:
-    """Parse busy.txt file and return list of (start, end, status) tuples in ET.
+@profiled('busy_file')
+def parse_busy_file(file_path: str) -> List[Tuple[int, int, int]]:
+    """Parse busy.txt file (times in ET) and return list of (start, end, status) epoch tuples.
 
     Supports two formats:
     - Full-day busy: YYYY-MM-DD
@@ -330,165 +579,18 @@ def parse_busy_file(file_path: str) -> List[Tuple[datetime, datetime, str]]:
                 start = datetime.combine(date, time(0, 0), tzinfo=et_tz)
                 end = datetime.combine(date + timedelta(days=1), time(0, 0), tzinfo=et_tz)
 
-            events.append((start, end, 'BUSY'))
+            events.append((epoch(start), epoch(end), BUSY))
         except (ValueError, IndexError) as e:
             print(f"Warning: Skipping malformed line {line_num} in {file_path}: {line}", file=sys.stderr)
             continue
 
     return events
 
-def find_free_windows(events: List[Tuple[datetime, datetime, str]], 
-                     buffer_mins: int = 30,
-                     start_date: datetime = None,
-                     target_tz: str = "America/New_York",
-                     strict: bool = False,
-                     work_start: time = time(10, 0),
-                     work_end: time = time(17, 0),
-                     extended: bool = False,
-                     ext_start: time = time(7, 0),
-                     ext_end: time = time(20, 0),
-                     min_duration: int = 30,
-                     days: int = 31) -> List[Tuple[datetime, datetime, bool]]:
-
-    # print(f"work_start: {work_start}, work_end: {work_end}")
-
-    """Find free time windows between 10am-5pm ET, excluding holidays."""
-    et_tz = ZoneInfo("America/New_York")
-    target_timezone = ZoneInfo(target_tz)
-    now = start_date if start_date else datetime.now(et_tz)
-    end_date = now + timedelta(days=days)
-
-    # Get holidays
-    holiday_list = get_us_holidays(now, end_date)
-    # Convert holidays to a set of dates for faster lookup
-    holiday_dates = {holiday[0].date() for holiday in holiday_list}
-
-    # Initialize with working hours for each day
-    free_windows = []
-    current = (now + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
-
-    # Define early and late hours for extended mode
-    early_start = ext_start
-    early_end = work_start
-    late_start = work_end
-    late_end = ext_end
-
-    while current < end_date:
-        is_weekend = current.weekday() >= 5  # Saturday or Sunday
-        is_extended_slot = False
-        
-        # Regular weekday slots (Mon-Fri)
-        if current.weekday() < 5 and current.date() not in holiday_dates:
-            day_start = current.replace(hour=work_start.hour, minute=work_start.minute)
-            day_end = current.replace(hour=work_end.hour, minute=work_end.minute)
-
-            if strict:
-                # Convert to target timezone to check working hours there
-                target_start = day_start.astimezone(target_timezone)
-                target_end = day_end.astimezone(target_timezone)
-
-                # Adjust window to respect working hours in both timezones
-                # Start time should be no earlier than 10 AM in either timezone
-                et_start = day_start
-                target_start = target_start.replace(
-                    hour=work_start.hour,
-                    minute=work_start.minute
-                )
-                effective_start = max(et_start, target_start.astimezone(et_tz))
-
-                # End time should be no later than 5 PM in either timezone
-                et_end = day_end
-                target_end = target_end.replace(
-                    hour=work_end.hour,
-                    minute=work_end.minute
-                )
-                effective_end = min(et_end, target_end.astimezone(et_tz))
-
-                # Only add the window if there's actually time available
-                if effective_start < effective_end:
-                    free_windows.append((effective_start, effective_end, is_extended_slot))
-            else:
-                free_windows.append((day_start, day_end, is_extended_slot))
-        
-        # Extended mode: add weekend, early, and late slots
-        if extended:
-            # Add weekend slots (if it's a weekend)
-            if is_weekend and current.date() not in holiday_dates:
-                is_extended_slot = True
-                day_start = current.replace(hour=work_start.hour, minute=work_start.minute)
-                day_end = current.replace(hour=work_end.hour, minute=work_end.minute)
-                
-                if strict:
-                    # Convert to target timezone to check working hours there
-                    target_start = day_start.astimezone(target_timezone)
-                    target_end = day_end.astimezone(target_timezone)
-
-                    # Adjust window to respect working hours in both timezones
-                    et_start = day_start
-                    target_start = target_start.replace(
-                        hour=work_start.hour,
-                        minute=work_start.minute
-                    )
-                    effective_start = max(et_start, target_start.astimezone(et_tz))
-
-                    # End time should be no later than 5 PM in either timezone
-                    et_end = day_end
-                    target_end = target_end.replace(
-                        hour=work_end.hour,
-                        minute=work_end.minute
-                    )
-                    effective_end = min(et_end, target_end.astimezone(et_tz))
-
-                    # Only add the window if there's actually time available
-                    if effective_start < effective_end:
-                        free_windows.append((effective_start, effective_end, is_extended_slot))
-                else:
-                    free_windows.append((day_start, day_end, is_extended_slot))
-            
-            # Add early slots (ext_start to work_start) for all days
-            if current.date() not in holiday_dates:
-                is_extended_slot = True
-                early_day_start = current.replace(hour=early_start.hour, minute=early_start.minute)
-                early_day_end = current.replace(hour=early_end.hour, minute=early_end.minute)
-                
-                if strict:
-                    # Convert to target timezone to check working hours
-                    target_start = early_day_start.astimezone(target_timezone)
-                    target_end = early_day_end.astimezone(target_timezone)
-                    
-                    # Check if the early hours are valid in both timezones
-                    # This is a bit different since we're checking specific early hours
-                    if (target_start.hour < work_start.hour and target_end.hour <= work_start.hour) or (target_start.hour < work_start.hour and target_end.minute == 0):
-                        free_windows.append((early_day_start, early_day_end, is_extended_slot))
-                else:
-                    free_windows.append((early_day_start, early_day_end, is_extended_slot))
-            
-            # Add late slots (work_end to ext_end) for all days
-            if current.date() not in holiday_dates:
-                is_extended_slot = True
-                late_day_start = current.replace(hour=late_start.hour, minute=late_start.minute)
-                late_day_end = current.replace(hour=late_end.hour, minute=late_end.minute)
-                
-                if strict:
-                    # Convert to target timezone to check working hours
-                    target_start = late_day_start.astimezone(target_timezone)
-                    target_end = late_day_end.astimezone(target_timezone)
-                    
-                    # Check if the late hours are valid in both timezones
-                    # This is a bit different since we're checking specific late hours
-                    if (target_start.hour >= work_end.hour and target_end.hour <= ext_end.hour) or (target_start.hour >= work_end.hour and target_end.minute == 0):
-                        free_windows.append((late_day_start, late_day_end, is_extended_slot))
-                else:
-                    free_windows.append((late_day_start, late_day_end, is_extended_slot))
-
-        current += timedelta(days=1)
-
-    # Remove busy times and apply buffer
-    busy_times = []
-    for start, end, status in events:
-        if status != 'FREE':
-            buffer = timedelta(minutes=buffer_mins)
-            busy_times.append((start - buffer, end + buffer))
+@profiled('merge')
+def merge_busy_times(events: List[Tuple[int, int, int]], buffer_mins: int = 30) -> List[Tuple[int, int]]:
+    """Apply the buffer to every non-FREE event and merge overlapping intervals."""
+    buffer = buffer_mins * 60
+    busy_times = [(start - buffer, end + buffer) for start, end, status in events if status != FREE]
 
     # Sort busy times first
     busy_times.sort()
@@ -499,29 +601,342 @@ def find_free_windows(events: List[Tuple[datetime, datetime, str]],
         else:
             merged[-1] = (merged[-1][0], max(merged[-1][1], busy[1]))
 
-    # Remove busy times from free windows
+    if PROFILE is not None:
+        count('busy_before_merge', len(busy_times))
+        count('busy_after_merge', len(merged))
+    return merged
+
+def stream_busy_times(events: Iterable[Tuple[int, int, int]], buffer_mins: int = 30) -> Iterator[Tuple[int, int]]:
+    """Lazy merge_busy_times for events that arrive in start order."""
+    buffer = buffer_mins * 60
+    current = None
+    for start, end, status in events:
+        if status == FREE:
+            continue
+        start, end = start - buffer, end + buffer
+        if current is None:
+            current = (start, end)
+        elif current[1] < start:
+            yield current
+            current = (start, end)
+        else:
+            current = (current[0], max(current[1], end))
+    if current is not None:
+        yield current
+
+def subtract_busy_times(windows: List[Tuple[int, int, bool]],
+                        busy: List[Tuple[int, int]]) -> List[Tuple[int, int, bool]]:
+    """Remove busy intervals from each (start, end, is_extended) window.
+
+    busy must be sorted and non-overlapping, as returned by merge_busy_times.
+    Each window bisects to the first busy interval ending after it starts and
+    walks forward only over the intervals it overlaps, so the cost is
+    O(windows * log(busy) + output) rather than O(windows * busy).
+    """
+    busy_ends = [busy_end for _, busy_end in busy]
     result = []
-    for free_start, free_end, is_extended in free_windows:
+    for free_start, free_end, is_extended in windows:
         current = free_start
-        for busy_start, busy_end in merged:
-            # Fix: Only process busy times that overlap with the free window
-            if busy_end > current and busy_start < free_end:
-                if current < busy_start:
-                    result.append((current, busy_start, is_extended))
-                current = max(current, busy_end)
+        i = bisect_right(busy_ends, free_start)
+        while i < len(busy) and busy[i][0] < free_end:
+            busy_start, busy_end = busy[i]
+            if current < busy_start:
+                result.append((current, busy_start, is_extended))
+            current = max(current, busy_end)
+            i += 1
         if current < free_end:
             result.append((current, free_end, is_extended))
+    return result
+
+def iter_free_pieces(windows: List[Tuple[int, int, bool]],
+                     busy: Iterable[Tuple[int, int]]) -> Iterator[Tuple[int, Tuple[int, int, bool]]]:
+    """Yield (window index, free piece) for windows minus a stream of busy intervals, in start order.
+
+    Windows must not overlap. They are visited in start order, and only the
+    busy intervals that may still touch the current window are kept, so
+    memory does not grow with the number of busy intervals, and busy is
+    only read as far as the windows visited so far.
+    """
+    busy = iter(busy)
+    upcoming = next(busy, None)
+    pending = deque()
+    for index in sorted(range(len(windows)), key=lambda i: windows[i][0]):
+        free_start, free_end, is_extended = windows[index]
+        # Pull in everything that starts before this window ends
+        while upcoming is not None and upcoming[0] < free_end:
+            pending.append(upcoming)
+            upcoming = next(busy, None)
+        # Drop everything that ended before it starts
+        while pending and pending[0][1] <= free_start:
+            pending.popleft()
+
+        current = free_start
+        for busy_start, busy_end in pending:
+            if current < busy_start:
+                yield index, (current, busy_start, is_extended)
+            current = max(current, busy_end)
+        if current < free_end:
+            yield index, (current, free_end, is_extended)
+
+def subtract_busy_stream(windows: List[Tuple[int, int, bool]],
+                         busy: Iterable[Tuple[int, int]]) -> List[Tuple[int, int, bool]]:
+    """subtract_busy_times for busy intervals from stream_busy_times, read once.
 
-    # Filter windows shorter than min_duration
-    min_duration_td = timedelta(minutes=min_duration)
-    filtered_windows = [(start, end, is_extended) for start, end, is_extended in result 
-                       if end - start >= min_duration_td]
+    Windows must not overlap; results come back in the original window order.
+    """
+    pieces = [[] for _ in windows]
+    for index, piece in iter_free_pieces(windows, busy):
+        pieces[index].append(piece)
+    return [piece for window_pieces in pieces for piece in window_pieces]
+
+def free_runs_numpy(windows: List[Tuple[int, int, bool]],
+                    busy: List[Tuple[int, int]],
+                    min_duration: int = 30) -> List[Tuple[int, int, bool]]:
+    """NumPy equivalent of subtract_busy_times plus the min_duration filter.
+
+    The horizon is cut into segments at every window and busy edge, so
+    boundaries stay exact to the second. Busy segments are marked with a
+    difference array, each segment is labelled with the window covering it,
+    and free runs are the stretches where the label stays the same and
+    nothing is busy. Windows must not overlap.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("the numpy backend requires numpy (pip install numpy)")
+
+    if not windows:
+        return []
+
+    window_array = np.array([(start, end) for start, end, _ in windows], dtype=np.int64)
+    busy_array = np.array(busy, dtype=np.int64).reshape(-1, 2)
+    points = np.unique(np.concatenate((window_array.ravel(), busy_array.ravel())))
+    size = len(points) - 1
+
+    # Label every segment with the index of the window covering it (-1 outside all windows)
+    window_starts = np.searchsorted(points, window_array[:, 0])
+    lengths = np.maximum(np.searchsorted(points, window_array[:, 1]) - window_starts, 0)
+    labels = np.full(size, -1, dtype=np.int64)
+    window_ids = np.repeat(np.arange(len(windows)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    labels[np.repeat(window_starts, lengths) + offsets] = window_ids
+
+    # Mark busy segments
+    if len(busy_array):
+        delta = np.zeros(size + 1, dtype=np.int64)
+        np.add.at(delta, np.searchsorted(points, busy_array[:, 0]), 1)
+        np.add.at(delta, np.searchsorted(points, busy_array[:, 1]), -1)
+        labels[np.cumsum(delta[:-1]) > 0] = -1
+
+    # Runs start and end wherever the label changes
+    padded = np.concatenate(([-1], labels, [-1]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    run_starts = points[edges[:-1]]
+    run_ends = points[edges[1:]]
+    run_labels = labels[edges[:-1]]
+    keep = (run_labels >= 0) & (run_ends - run_starts >= min_duration * 60)
+    run_starts, run_ends, run_labels = run_starts[keep], run_ends[keep], run_labels[keep]
+
+    # Emit in window order, then by time, like the interval engine
+    order = np.lexsort((run_starts, run_labels))
+    return [(start, end, windows[label][2])
+            for start, end, label in zip(run_starts[order].tolist(), run_ends[order].tolist(),
+                                         run_labels[order].tolist())]
+
+@profiled('windows')
+def candidate_windows(now: datetime,
+                      end_date: datetime,
+                      target_tz: str = "America/New_York",
+                      strict: bool = False,
+                      work_start: time = time(10, 0),
+                      work_end: time = time(17, 0),
+                      extended: bool = False,
+                      ext_start: time = time(7, 0),
+                      ext_end: time = time(20, 0),
+                      holiday_country: str = 'US',
+                      holiday_subdiv: str = None,
+                      holiday_cache_dir: str = None) -> List[Tuple[int, int, bool]]:
+    """Build the (start, end, is_extended) working-hour windows (hours in now's timezone, epoch seconds) for each day after now.
+
+    Every slot edge over the horizon is converted in bulk, as a list of
+    wall-clock times, through offset tables for now's timezone and target_tz
+    that are built once; no datetime is created per day, and DST comes from
+    the tables. A now without a ZoneInfo (e.g. timezone.utc) is taken in ET.
+    """
+    home_tz = getattr(now.tzinfo, 'key', None)
+    if home_tz is None:
+        # The offset tables are looked up by zone name
+        home_tz = "America/New_York"
+        now = now.astimezone(ZoneInfo(home_tz))
+    epoch_day = EPOCH_DATE.toordinal()
+    end_ts = end_date.timestamp()
+    home = horizon_offsets(home_tz, now.timestamp(), end_ts)
+    target = horizon_offsets(target_tz, now.timestamp(), end_ts)
+
+    def walls(days, clock):
+        # Wall-clock seconds of clock on each day
+        seconds = clock.hour * 3600 + clock.minute * 60
+        return [(day - epoch_day) * 86400 + seconds for day in days]
+
+    # Days start with the one after now (checked at 10 AM, as before) and run up to end_date
+    first_day = (now + timedelta(days=1)).date().toordinal()
+    days = list(range(first_day, first_day + int((end_ts - now.timestamp()) // 86400) + 2))
+    days = days[:bisect_left(to_utc(walls(days, time(10, 0)), home), end_ts)]
+
+    # Get holidays as a set of date ordinals for faster lookup
+    holiday_list = get_holidays(now, end_date, holiday_country, holiday_subdiv, holiday_cache_dir)
+    holiday_days = {holiday[0].toordinal() for holiday in holiday_list}
+    open_days = [day for day in days if day not in holiday_days]
+
+    def working_hours(days):
+        starts = to_utc(walls(days, work_start), home)
+        ends = to_utc(walls(days, work_end), home)
+        if strict:
+            # Start no earlier than work_start and end no later than work_end in the
+            # target timezone too, on the target dates of the slot's start and end
+            start_days = [local // 86400 + epoch_day for local in to_local(starts, target)]
+            end_days = [local // 86400 + epoch_day for local in to_local(ends, target)]
+            starts = [max(pair) for pair in zip(starts, to_utc(walls(start_days, work_start), target))]
+            ends = [min(pair) for pair in zip(ends, to_utc(walls(end_days, work_end), target))]
+        return {day: (start, end) for day, start, end in zip(days, starts, ends) if start < end}
+
+    def target_clocks(times):
+        # (hour, minute) of each epoch time in the target timezone
+        return [divmod(local % 86400 // 60, 60) for local in to_local(times, target)]
+
+    # Regular weekday slots (Mon-Fri); (day - 1) % 7 is the weekday of a date ordinal
+    regular = working_hours([day for day in open_days if (day - 1) % 7 < 5])
+
+    # Extended mode: add weekend, early, and late slots
+    weekend = early = late = {}
+    if extended:
+        weekend = working_hours([day for day in open_days if (day - 1) % 7 >= 5])
+
+        # Early slots (ext_start to work_start); strict keeps those that start
+        # before work_start in the target timezone and end by then or on the hour
+        starts = to_utc(walls(open_days, ext_start), home)
+        ends = to_utc(walls(open_days, work_start), home)
+        early = {day: (start, end) for day, start, end in zip(open_days, starts, ends)}
+        if strict:
+            early = {day: window for day, window, (start_hour, _), (end_hour, end_minute)
+                     in zip(open_days, early.values(), target_clocks(starts), target_clocks(ends))
+                     if start_hour < work_start.hour and (end_hour <= work_start.hour or end_minute == 0)}
+
+        # Late slots (work_end to ext_end); strict keeps those that start at or
+        # after work_end in the target timezone and end by ext_end or on the hour
+        starts = to_utc(walls(open_days, work_end), home)
+        ends = to_utc(walls(open_days, ext_end), home)
+        late = {day: (start, end) for day, start, end in zip(open_days, starts, ends)}
+        if strict:
+            late = {day: window for day, window, (start_hour, _), (end_hour, end_minute)
+                    in zip(open_days, late.values(), target_clocks(starts), target_clocks(ends))
+                    if start_hour >= work_end.hour and (end_hour <= ext_end.hour or end_minute == 0)}
+
+    # Each day lists its regular, weekend, early and late slots in that order
+    free_windows = []
+    for day in open_days:
+        for slots, is_extended_slot in ((regular, False), (weekend, True), (early, True), (late, True)):
+            if day in slots:
+                free_windows.append(slots[day] + (is_extended_slot,))
+    return free_windows
+
+@profiled('subtract')
+def remove_busy_times(windows: List[Tuple[int, int, bool]],
+                      busy: Iterable[Tuple[int, int]],
+                      min_duration: int = 30,
+                      backend: str = 'interval') -> List[Tuple[int, int, bool]]:
+    """Subtract merged busy intervals from windows and drop pieces shorter than min_duration.
+
+    busy is a list from merge_busy_times, or a stream from stream_busy_times.
+    """
+    if backend == 'numpy':
+        # Remove busy times and filter short windows on a grid of their edges
+        filtered_windows = free_runs_numpy(windows, busy if isinstance(busy, list) else list(busy), min_duration)
+    else:
+        # Remove busy times from free windows
+        if isinstance(busy, list):
+            result = subtract_busy_times(windows, busy)
+        else:
+            result = subtract_busy_stream(windows, busy)
+
+        # Filter windows shorter than min_duration
+        min_duration_secs = min_duration * 60
+        filtered_windows = [(start, end, is_extended) for start, end, is_extended in result
+                           if end - start >= min_duration_secs]
+
+    return filtered_windows
+
+# Bump whenever the layout of the incremental state changes
+STATE_VERSION = 2
+
+def remove_busy_times_incremental(windows: List[Tuple[int, int, bool]],
+                                  busy: List[Tuple[int, int]],
+                                  min_duration: int,
+                                  backend: str,
+                                  state_dir: str,
+                                  params: tuple,
+                                  verbose: bool = False) -> List[Tuple[int, int, bool]]:
+    """remove_busy_times that only recomputes the days whose busy intervals changed.
+
+    The merged busy set and each day's windows and results are kept in
+    state_dir, keyed by params (everything else that shapes the result). A
+    day is reused when its candidate windows are the same as last time and
+    no added or removed busy interval touches it.
+    """
+    key = hashlib.sha256(repr((STATE_VERSION,) + tuple(params)).encode('utf-8')).hexdigest()
+    path = Path(state_dir) / f"{key}.pickle"
+    state = load_pickle(path, "state") or {'busy': [], 'days': {}}
+
+    et_tz = ZoneInfo("America/New_York")
+
+    def et_date(ts):
+        return datetime.fromtimestamp(ts, et_tz).date()
+
+    # Group windows by ET day, in order
+    day_windows = {}
+    for window in windows:
+        day_windows.setdefault(et_date(window[0]), []).append(window)
+    if not day_windows:
+        return []
+    first_date = min(day_windows)
+    last_date = max(day_windows)
+
+    # Every day touched by a busy interval that was added or removed
+    dirty_dates = set()
+    for busy_start, busy_end in set(busy).symmetric_difference(state['busy']):
+        date = max(et_date(busy_start), first_date)
+        while date <= min(et_date(busy_end), last_date):
+            dirty_dates.add(date)
+            date += timedelta(days=1)
+
+    stale = [date for date, day in day_windows.items()
+             if date in dirty_dates or date not in state['days'] or state['days'][date][0] != day]
+    recomputed = {date: [] for date in stale}
+    for window in remove_busy_times([window for date in stale for window in day_windows[date]],
+                                    busy, min_duration, backend):
+        recomputed[et_date(window[0])].append(window)
+    if verbose:
+        print(f"recomputed {len(stale)} of {len(day_windows)} days", file=sys.stderr)
+
+    # Splice recomputed days into the stored results
+    days = {}
+    result = []
+    for date, day in day_windows.items():
+        day_result = recomputed[date] if date in recomputed else state['days'][date][1]
+        days[date] = (day, day_result)
+        result.extend(day_result)
+
+    atomic_write(path, pickle.dumps({'busy': busy, 'days': days}, protocol=pickle.HIGHEST_PROTOCOL))
+
+    return result
 
-    # Filter past windows and round start times up to next 15-minute boundary
-    final_result = []
-    current_time = datetime.now(et_tz)
+def finalized(windows: Iterable[Tuple[int, int, bool]],
+              min_duration: int = 30) -> Iterator[Tuple[int, int, bool]]:
+    """Lazy finalize_windows."""
+    min_duration_secs = min_duration * 60
+    current_time = int(datetime.now().timestamp())
 
-    for start, end, is_extended in filtered_windows:
+    for start, end, is_extended in windows:
         # Skip windows that have completely passed
         if end <= current_time:
             continue
@@ -530,168 +945,1416 @@ def find_free_windows(events: List[Tuple[datetime, datetime, str]],
         if start < current_time:
             start = current_time
 
-        # Round up start time to next 15-minute boundary
-        minutes = start.minute
-        rounded_minutes = ((minutes + 14) // 15) * 15  # Rounds up to next 15
-        if rounded_minutes == 60:
-            start = start.replace(hour=start.hour + 1, minute=0)
-        else:
-            start = start.replace(minute=rounded_minutes)
+        # Round up the minute to the next 15 (keeping the seconds, as before);
+        # ET offsets are whole hours, so epoch and wall-clock quarters agree
+        minutes, seconds = divmod(start, 60)
+        start = -(-minutes // 15) * 15 * 60 + seconds
+
+        if start < end and end - start >= min_duration_secs:
+            yield start, end, is_extended
 
-        if start < end and end - start >= min_duration_td:
-            final_result.append((start, end, is_extended))
+@profiled('finalize')
+def finalize_windows(windows: List[Tuple[int, int, bool]], min_duration: int = 30) -> List[Tuple[int, int, bool]]:
+    """Drop windows that have passed, and round start times up to the next 15 minutes."""
+    final_result = list(finalized(windows, min_duration))
 
+    if PROFILE is not None:
+        count('windows_emitted', len(final_result))
     return final_result
 
-def format_windows(windows: List[Tuple[datetime, datetime, bool]], target_tz: str = "America/New_York", compare: bool = False) -> List[str]:
-    """Format time windows in the requested format."""
-    formatted = []
-    last_week = None
-    target_timezone = ZoneInfo(target_tz)
+def find_free_windows(events: List[Tuple[int, int, int]], 
+                     buffer_mins: int = 30,
+                     start_date: datetime = None,
+                     target_tz: str = "America/New_York",
+                     strict: bool = False,
+                     work_start: time = time(10, 0),
+                     work_end: time = time(17, 0),
+                     extended: bool = False,
+                     ext_start: time = time(7, 0),
+                     ext_end: time = time(20, 0),
+                     min_duration: int = 30,
+                     days: int = 31,
+                     busy: Iterable[Tuple[int, int]] = None,
+                     backend: str = 'interval',
+                     state_dir: str = None,
+                     holiday_country: str = 'US',
+                     holiday_subdiv: str = None,
+                     holiday_cache_dir: str = None,
+                     verbose: bool = False) -> List[Tuple[int, int, bool]]:
+    """Find free time windows between 10am-5pm ET, excluding holidays in holiday_country.
+
+    With state_dir, the busy set and per-day results are kept between runs
+    and only days whose busy intervals changed are recomputed. busy may be a
+    stream from stream_busy_times, in which case events is not used.
+    """
     et_tz = ZoneInfo("America/New_York")
-    
-    # First pass to find the maximum length of formatted lines
-    max_duration_len = 0
-    for start, end, is_extended in windows:
-        start = start.astimezone(target_timezone)
-        end = end.astimezone(target_timezone)
-        
-        duration = end - start
-        hours = duration.seconds // 3600
-        minutes = (duration.seconds % 3600) // 60
-        
-        # Format duration
-        duration_str = ""
-        if hours > 0:
-            duration_str += f"{hours}h"
-            if minutes > 0:
-                duration_str += f"{minutes}m"
-        elif minutes > 0:
-            duration_str += f"{minutes}m"
-            
-        max_duration_len = max(max_duration_len, len(duration_str))
-
-    def format_window(s, e, tz_name, is_extended=False):
-        day_str = str(s.day)
-        if len(day_str) == 1:
-            day_str = " " + day_str
-        date_str = f"{s.strftime('%a')} {day_str} {s.strftime('%b')}"
-
-        def format_time(dt):
-            hour = dt.strftime("%I").lstrip("0")
-            return f"{hour}:{dt.strftime('%M')} {dt.strftime('%p')}"
-
-        start_str = format_time(s).rjust(8)
-        end_str = format_time(e).rjust(8)
-
-        duration = e - s
-        hours = duration.seconds // 3600
-        minutes = (duration.seconds % 3600) // 60
-
-        # Format duration
-        duration_str = ""
-        if hours > 0:
-            duration_str += f"{hours}h"
-            if minutes > 0:
-                duration_str += f"{minutes}m"
-        elif minutes > 0:
-            duration_str += f"{minutes}m"
-        
-        # Add type indicator for extended slots
-        type_indicator = ""
-        if is_extended:
-            indicators = []
-            # Weekend
-            if s.weekday() >= 5:
-                indicators.append("wknd")
-            
-            # Early morning hours (7-10 AM)
-            if s.hour < 10:
-                indicators.append("morn")
-            # Evening hours (5-8 PM)
-            elif s.hour >= 17:
-                indicators.append("even")
-            
-            type_indicator = " ".join(indicators)
-
-        # Format with proper columnation - ensuring all type indicators are aligned
-        padded_duration = f"({duration_str})"
-        if type_indicator:
-            # Pad to max_duration_len + 2 (for the parentheses)
-            return f"{date_str:>10} @ {start_str} – {end_str} {tz_name} {padded_duration:<{max_duration_len+2}} {type_indicator}"
+    now = start_date if start_date else datetime.now(et_tz)
+    end_date = now + timedelta(days=days)
+
+    # Initialize with working hours for each day
+    free_windows = candidate_windows(now, end_date, target_tz, strict, work_start, work_end,
+                                     extended, ext_start, ext_end, holiday_country, holiday_subdiv, holiday_cache_dir)
+
+    # Remove busy times and apply buffer
+    merged = busy if busy is not None else merge_busy_times(events, buffer_mins)
+
+    if state_dir:
+        # The stored busy set is compared as a whole, so a stream is collected first
+        merged = merged if isinstance(merged, list) else list(merged)
+        params = (target_tz, strict, work_start, work_end, extended, ext_start, ext_end, min_duration, buffer_mins,
+                  backend)
+        filtered_windows = remove_busy_times_incremental(free_windows, merged, min_duration, backend,
+                                                         state_dir, params, verbose)
+    else:
+        filtered_windows = remove_busy_times(free_windows, merged, min_duration, backend)
+
+    return finalize_windows(filtered_windows, min_duration)
+
+def next_free_windows(events: Iterable[Tuple[int, int, int]],
+                      limit: int,
+                      buffer_mins: int = 30,
+                      start_date: datetime = None,
+                      target_tz: str = "America/New_York",
+                      strict: bool = False,
+                      work_start: time = time(10, 0),
+                      work_end: time = time(17, 0),
+                      extended: bool = False,
+                      ext_start: time = time(7, 0),
+                      ext_end: time = time(20, 0),
+                      min_duration: int = 30,
+                      days: int = 31,
+                      holiday_country: str = 'US',
+                      holiday_subdiv: str = None,
+                      holiday_cache_dir: str = None,
+                      only: List[str] = None) -> List[Tuple[int, int, bool]]:
+    """The first limit windows of find_free_windows in start order, without looking past them.
+
+    events must arrive in start order, as from stream_events. Busy intervals
+    are merged, and recurring events expanded, only up to the end of the
+    last window examined, and the search stops at the limit-th window that
+    is still long enough after rounding (and matches only, if given). There
+    is no backend, state_dir or verbose, since nothing is collected.
+    """
+    et_tz = ZoneInfo("America/New_York")
+    now = start_date if start_date else datetime.now(et_tz)
+    end_date = now + timedelta(days=days)
+
+    windows = candidate_windows(now, end_date, target_tz, strict, work_start, work_end,
+                                extended, ext_start, ext_end, holiday_country, holiday_subdiv, holiday_cache_dir)
+
+    min_duration_secs = min_duration * 60
+    pieces = (piece for _, piece in iter_free_pieces(windows, stream_busy_times(events, buffer_mins))
+              if piece[1] - piece[0] >= min_duration_secs)
+    found = finalized(pieces, min_duration)
+    if only:
+        found = (window for window in found if filter_windows([window], only, target_tz))
+    return list(islice(found, limit))
+
+# Bump whenever the layout of a saved busy index changes
+BUSY_INDEX_VERSION = 1
+
+def build_busy_index(busy: List[Tuple[int, int]], start: int, end: int, buffer_mins: int = 30) -> dict:
+    """Index merged busy intervals for availability queries between start and end (epoch seconds).
+
+    busy must be sorted and non-overlapping, as returned by merge_busy_times,
+    so it already includes the buffer. Starts and ends are kept as separate
+    sorted lists, and every query is a bisect into them.
+    """
+    return {'version': BUSY_INDEX_VERSION, 'start': start, 'end': end, 'buffer_mins': buffer_mins,
+            'starts': [busy_start for busy_start, _ in busy], 'ends': [busy_end for _, busy_end in busy]}
+
+def busy_range(index: dict, start: int, end: int) -> Tuple[int, int]:
+    """Positions of the first and one past the last busy interval overlapping [start, end)."""
+    if start < index['start'] or end > index['end']:
+        raise ValueError(f"{start}-{end} is outside the indexed range {index['start']}-{index['end']}")
+    first = bisect_right(index['ends'], start)
+    return first, bisect_left(index['starts'], end, first)
+
+def is_free(index: dict, start: int, end: int) -> bool:
+    """Whether [start, end) has no busy time, in O(log n)."""
+    first, last = busy_range(index, start, end)
+    return first == last
+
+def overlaps(index: dict, start: int, end: int) -> List[Tuple[int, int]]:
+    """The busy intervals overlapping [start, end), in O(log n + k)."""
+    first, last = busy_range(index, start, end)
+    return list(zip(index['starts'][first:last], index['ends'][first:last]))
+
+def free_between(index: dict, start: int, end: int) -> List[Tuple[int, int]]:
+    """The free (start, end) gaps in [start, end), in O(log n + k)."""
+    gaps = []
+    current = start
+    for busy_start, busy_end in overlaps(index, start, end):
+        if current < busy_start:
+            gaps.append((current, busy_start))
+        current = max(current, busy_end)
+    if current < end:
+        gaps.append((current, end))
+    return gaps
+
+def save_busy_index(path: str, index: dict) -> None:
+    """Write a busy index for load_busy_index, replacing any previous one atomically."""
+    atomic_write(path, pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+
+def load_busy_index(path: str) -> dict:
+    """Load a busy index written by save_busy_index (--busy-index), without reading any calendar."""
+    with open(path, 'rb') as f:
+        index = pickle.load(f)
+    if not isinstance(index, dict) or index.get('version') != BUSY_INDEX_VERSION:
+        raise ValueError(f"{path} is not a busy index from this version; rebuild it with --busy-index")
+    return index
+
+def attendee_free_times(events: List[Tuple[int, int, int]],
+                        now: datetime,
+                        end_date: datetime,
+                        tz_name: str = "America/New_York",
+                        work_start: time = time(10, 0),
+                        work_end: time = time(17, 0),
+                        buffer_mins: int = 30,
+                        holiday_country: str = 'US',
+                        holiday_subdiv: str = None,
+                        holiday_cache_dir: str = None) -> List[Tuple[int, int]]:
+    """One attendee's sorted (start, end) free intervals: their working hours in tz_name minus their busy times."""
+    windows = candidate_windows(now.astimezone(ZoneInfo(tz_name)), end_date, tz_name,
+                                work_start=work_start, work_end=work_end,
+                                holiday_country=holiday_country, holiday_subdiv=holiday_subdiv,
+                                holiday_cache_dir=holiday_cache_dir)
+    windows.sort()
+    busy = merge_busy_times(events, buffer_mins)
+    return [(start, end) for start, end, _ in subtract_busy_times(windows, busy)]
+
+def common_free_times(free_times: dict, all_but: int = 0) -> List[Tuple[int, int, Tuple[str, ...]]]:
+    """Intersect attendees' free intervals, allowing up to all_but of them to be busy.
+
+    free_times maps each attendee to their sorted, non-overlapping (start, end)
+    intervals. Their edges are swept in time order through a heap-based k-way
+    merge, so the cost is O(intervals * log(attendees)) no matter how many
+    days the intervals cover. Returns (start, end, missing attendees) for every
+    stretch where at most all_but attendees are busy, split wherever the set
+    of missing attendees changes.
+    """
+    def edges(name, intervals):
+        for start, end in intervals:
+            yield start, 1, name
+            yield end, -1, name
+
+    # Everyone starts out busy; attendees move out of the set while inside a free interval
+    busy = set(free_times)
+    result = []
+    previous = None
+    for ts, delta, name in heapq.merge(*(edges(name, intervals) for name, intervals in free_times.items())):
+        if previous is not None and ts > previous and len(busy) <= all_but:
+            missing = tuple(sorted(busy))
+            if result and result[-1][1] == previous and result[-1][2] == missing:
+                result[-1] = (result[-1][0], ts, missing)
+            else:
+                result.append((previous, ts, missing))
+        if delta > 0:
+            busy.discard(name)
         else:
-            return f"{date_str:>10} @ {start_str} – {end_str} {tz_name} {padded_duration}"
+            busy.add(name)
+        previous = ts
+    return result
+
+def find_group_windows(attendees: dict,
+                       events: dict,
+                       buffer_mins: int = 30,
+                       start_date: datetime = None,
+                       days: int = 31,
+                       min_duration: int = 30,
+                       all_but: int = 0,
+                       holiday_cache_dir: str = None) -> List[Tuple[int, int, Tuple[str, ...]]]:
+    """Find windows when every attendee, or all but all_but of them, is free.
+
+    attendees maps each name to its settings from load_attendees, and events
+    maps each name to that attendee's parsed events.
+    """
+    if not 0 <= all_but < len(attendees):
+        raise ValueError(f"--all-but must be between 0 and {len(attendees) - 1}")
+
+    et_tz = ZoneInfo("America/New_York")
+    now = start_date if start_date else datetime.now(et_tz)
+    end_date = now + timedelta(days=days)
+
+    free_times = {
+        name: attendee_free_times(events[name], now, end_date, attendee['timezone'],
+                                  attendee['work_start'], attendee['work_end'], buffer_mins,
+                                  attendee['holidays'], attendee['holiday_subdiv'], holiday_cache_dir)
+        for name, attendee in attendees.items()
+    }
+    min_duration_secs = min_duration * 60
+    windows = [window for window in common_free_times(free_times, all_but)
+               if window[1] - window[0] >= min_duration_secs]
+    return finalize_windows(windows, min_duration)
+
+@lru_cache(maxsize=None)
+def slot_tags(weekday: int, hour: int, is_extended: bool) -> Tuple[str, ...]:
+    """Tag an extended slot by the weekday and hour it starts at: wknd, then morn or even."""
+    tags = []
+    if is_extended:
+        # Weekend
+        if weekday >= 5:
+            tags.append("wknd")
+
+        # Early morning hours (7-10 AM)
+        if hour < 10:
+            tags.append("morn")
+        # Evening hours (5-8 PM)
+        elif hour >= 17:
+            tags.append("even")
+    return tuple(tags)
+
+def window_tags(start: datetime, is_extended: bool) -> List[str]:
+    """Tag an extended slot by its start in the display timezone: wknd, then morn or even."""
+    return list(slot_tags(start.weekday(), start.hour, is_extended))
+
+def filter_windows(windows: List[Tuple[int, int, bool]], only: List[str], target_tz: str = "America/New_York") -> List[Tuple[int, int, bool]]:
+    """Keep windows matching the --only tags, like the checkboxes on the extended page.
+
+    Time of day (morn, dytm, even) and day of week (wkdy, wknd) are separate
+    groups: a window must match one listed tag from each group that has any.
+    Untagged windows count as dytm and wkdy.
+    """
+    only = set(only)
+    unknown = only - {'morn', 'dytm', 'even', 'wkdy', 'wknd'}
+    if unknown:
+        raise ValueError(f"unknown tags: {', '.join(sorted(unknown))}")
+    times_of_day = only & {'morn', 'dytm', 'even'}
+    days_of_week = only & {'wkdy', 'wknd'}
+
+    target_timezone = ZoneInfo(target_tz)
+    kept = []
+    for start, end, is_extended in windows:
+        tags = window_tags(datetime.fromtimestamp(start, target_timezone), is_extended)
+        time_of_day = 'morn' if 'morn' in tags else 'even' if 'even' in tags else 'dytm'
+        day_of_week = 'wknd' if 'wknd' in tags else 'wkdy'
+        if (not times_of_day or time_of_day in times_of_day) and (not days_of_week or day_of_week in days_of_week):
+            kept.append((start, end, is_extended))
+    return kept
+
+def window_records(windows: List[Tuple[int, int, bool]], target_tz: str = "America/New_York") -> List[dict]:
+    """Turn windows into JSON-ready records with UTC times, duration in minutes and tags."""
+    target_timezone = ZoneInfo(target_tz)
+    utc = ZoneInfo("UTC")
+    records = []
+    for start, end, is_extended in sorted(windows, key=itemgetter(0)):
+        utc_start = datetime.fromtimestamp(start, utc)
+        utc_end = datetime.fromtimestamp(end, utc)
+        records.append({
+            'start': utc_start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'end': utc_end.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'duration': int((utc_end - utc_start).total_seconds() // 60),
+            'tags': window_tags(utc_start.astimezone(target_timezone), is_extended),
+        })
+    return records
+
+@profiled('format')
+def format_records(windows: List[Tuple[int, int, bool]], target_tz: str = "America/New_York", output_format: str = 'json') -> List[str]:
+    """Format windows as one JSON array (json) or one JSON object per line (ndjson)."""
+    records = window_records(windows, target_tz)
+    if output_format == 'ndjson':
+        return [json.dumps(record) for record in records]
+    return [json.dumps(records, indent=2)]
+
+# Spacing of the offset_transitions probes; tzdb offsets last longer than this (the shortest is ~6.9 days)
+TRANSITION_PROBE = 4 * 86400
+
+@lru_cache(maxsize=None)
+def offset_transitions(tz_name: str, year: int) -> Tuple[List[int], List[Tuple[int, str]]]:
+    """UTC offset changes of tz_name during one UTC year: (epoch starts, [(offset seconds, abbreviation)]).
+
+    The first entry is the offset in force when the year starts. The year
+    is probed every TRANSITION_PROBE seconds and each change found is
+    bisected to the second, so only offsets that change and change back
+    between two probes are missed.
+    """
+    tz = ZoneInfo(tz_name)
+
+    def state(ts):
+        local = datetime.fromtimestamp(ts, tz)
+        return local.utcoffset(), local.tzname()
+
+    first = epoch(datetime(year, 1, 1, tzinfo=timezone.utc))
+    last = epoch(datetime(year + 1, 1, 1, tzinfo=timezone.utc))
+    probes = list(range(first, last, TRANSITION_PROBE)) + [last]
+    probed = [(local.utcoffset(), local.tzname()) for local in (datetime.fromtimestamp(ts, tz) for ts in probes)]
+    starts = [first]
+    states = [probed[0]]
+    for i in range(1, len(probes)):
+        low = probes[i - 1]
+        # More than one change may fall between two probes
+        while probed[i] != states[-1]:
+            high = probes[i]
+            while high - low > 1:
+                middle = (low + high) // 2
+                if state(middle) == states[-1]:
+                    low = middle
+                else:
+                    high = middle
+            if high >= last:
+                break
+            starts.append(high)
+            states.append(state(high))
+            low = high
+    return starts, [(int(offset.total_seconds()), name) for offset, name in states]
+
+def timezone_offsets(cache_dir: str = None) -> List[Tuple[str, int]]:
+    """Return (timezone, current UTC offset in seconds) for every available zone.
+
+    The offset_transitions tables for this year are pickled in cache_dir, so
+    later listings only bisect them instead of building ~600 zones.
+    """
+    now = datetime.now().timestamp()
+    year = gmtime(now).tm_year
+    zones = sorted(available_timezones())
+    tables = None
+
+    path = Path(cache_dir) / f"timezones-{year}.pickle" if cache_dir else None
+    if path:
+        cached = load_pickle(path, "timezone cache")
+        if isinstance(cached, dict) and cached.get('zones') == zones:
+            tables = cached.get('tables')
+
+    if tables is None and not path:
+        # Nothing to reuse later, so only look up the offset in force now
+        offsets = []
+        for tz_name in zones:
+            try:
+                offsets.append((tz_name, int(datetime.now(ZoneInfo(tz_name)).utcoffset().total_seconds())))
+            except Exception:
+                continue
+        return offsets
 
+    if tables is None:
+        tables = {}
+        for tz_name in zones:
+            try:
+                tables[tz_name] = offset_transitions(tz_name, year)
+            except Exception:
+                continue
+        if path:
+            atomic_write(path, pickle.dumps({'zones': zones, 'tables': tables}, protocol=pickle.HIGHEST_PROTOCOL))
+
+    offsets = []
+    for tz_name, (starts, states) in tables.items():
+        offset, _ = states[bisect_right(starts, now) - 1]
+        offsets.append((tz_name, offset))
+    return offsets
+
+def local_time(ts: float, tz_name: str) -> Tuple[float, str]:
+    """Wall-clock seconds since 1970-01-01 in tz_name, and the zone abbreviation, for an epoch time."""
+    starts, states = offset_transitions(tz_name, gmtime(ts).tm_year)
+    offset, abbreviation = states[bisect_right(starts, ts) - 1]
+    return ts + offset, abbreviation
+
+@lru_cache(maxsize=None)
+def wall_transitions(tz_name: str, year: int) -> Tuple[List[int], List[int]]:
+    """offset_transitions keyed by wall-clock time: (wall-clock starts, offsets).
+
+    A change takes effect at the later of its two wall-clock readings, so
+    times in a gap or a fold resolve to the earlier offset, as with fold=0.
+    """
+    starts, states = offset_transitions(tz_name, year)
+    offsets = [offset for offset, _ in states]
+    walls = [starts[0] + offsets[0]]
+    walls += [start + max(before, after) for start, before, after in zip(starts[1:], offsets, offsets[1:])]
+    return walls, offsets
+
+def horizon_offsets(tz_name: str, first_ts: float, last_ts: float) -> Tuple[List[int], List[int], List[int]]:
+    """Join the yearly tables of tz_name around [first_ts, last_ts] into (starts, wall-clock starts, offsets)."""
+    starts, walls, offsets = [], [], []
+    for year in range(gmtime(first_ts).tm_year - 1, gmtime(last_ts).tm_year + 2):
+        year_starts, states = offset_transitions(tz_name, year)
+        year_walls, year_offsets = wall_transitions(tz_name, year)
+        starts += year_starts
+        walls += year_walls
+        offsets += year_offsets
+    return starts, walls, offsets
+
+def to_utc(walls: List[int], table: tuple) -> List[int]:
+    """Epoch seconds for each wall-clock time (seconds since 1970-01-01) in a horizon_offsets table."""
+    _, wall_starts, offsets = table
+    return [wall - offsets[bisect_right(wall_starts, wall) - 1] for wall in walls]
+
+def to_local(times: List[int], table: tuple) -> List[int]:
+    """Wall-clock seconds since 1970-01-01 for each epoch time in a horizon_offsets table."""
+    starts, _, offsets = table
+    return [ts + offsets[bisect_right(starts, ts) - 1] for ts in times]
+
+# Day numbers count from here, in whatever timezone the seconds are local to
+EPOCH_DATE = datetime(1970, 1, 1).date()
+
+@lru_cache(maxsize=None)
+def day_label(day: int) -> Tuple[str, int, int]:
+    """Date column ("Mon  5 Oct"), weekday and ISO week number for a day number since 1970-01-01."""
+    date = EPOCH_DATE + timedelta(days=day)
+    return f"{date.strftime('%a')} {date.day:>2} {date.strftime('%b')}", date.weekday(), date.isocalendar()[1]
+
+@lru_cache(maxsize=None)
+def clock_label(minute: int) -> str:
+    """Right-aligned 12-hour clock (" 9:05 AM") for a minute of the day."""
+    hour, minute = divmod(minute, 60)
+    return f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}".rjust(8)
+
+@lru_cache(maxsize=None)
+def duration_label(minutes: int) -> str:
+    """Duration as 1h, 1h30m or 30m (empty for under a minute)."""
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return f"{hours}h{minutes}m" if minutes > 0 else f"{hours}h"
+    return f"{minutes}m" if minutes > 0 else ""
+
+def local_window(start: float, end: float, tz_name: str, is_extended: bool) -> tuple:
+    """Convert one window to the display fields for tz_name.
+
+    Returns (day, hour, date column, week, start clock, end clock, abbreviation,
+    duration, tags), with the duration in wall-clock time as before.
+    """
+    local_start, abbreviation = local_time(start, tz_name)
+    local_end, _ = local_time(end, tz_name)
+    day, second = divmod(int(local_start), 86400)
+    date_str, weekday, week = day_label(day)
+    hour = second // 3600
+    end_minute = int(local_end) % 86400 // 60
+    duration = int(round(local_end - local_start, 6)) % 86400 // 60
+    return (day, hour, date_str, week, clock_label(second // 60), clock_label(end_minute),
+            abbreviation, duration_label(duration), slot_tags(weekday, hour, is_extended))
+
+def format_line(fields: tuple, duration_width: int) -> str:
+    """Render the fields from local_window as one output line."""
+    _, _, date_str, _, start_str, end_str, abbreviation, duration_str, tags = fields
+    padded_duration = f"({duration_str})"
+    if tags:
+        # Pad to the widest duration plus the parentheses so the tags line up
+        return f"{date_str:>10} @ {start_str} – {end_str} {abbreviation} {padded_duration:<{duration_width + 2}} {' '.join(tags)}"
+    return f"{date_str:>10} @ {start_str} – {end_str} {abbreviation} {padded_duration}"
+
+@profiled('format')
+def format_windows(windows: List[Tuple[int, int, bool]], target_tz: str = "America/New_York", compare: bool = False) -> List[str]:
+    """Format time windows in the requested format.
+
+    Each window is converted once through the cached offset tables, and the
+    date, clock and duration strings come from cached lookups, so rendering
+    many timezones in one process reuses most of the work.
+    """
+    rows = [local_window(start, end, target_tz, is_extended) for start, end, is_extended in windows]
+    duration_width = max((len(row[7]) for row in rows), default=0)
+
+    formatted = []
     if compare:
-        # First pass: calculate the maximum length of formatted lines
-        max_length = 0
-        formatted_pairs = []
-        for start, end, is_extended in windows:
-            target_start = start.astimezone(target_timezone)
-            target_end = end.astimezone(target_timezone)
-            et_start = start
-            et_end = end
-
-            target_line = format_window(target_start, target_end, target_start.tzname(), is_extended)
-            et_line = format_window(et_start, et_end, et_start.tzname(), is_extended)
-            max_length = max(max_length, len(target_line))
-            formatted_pairs.append((target_line, et_line))
-
-        # Second pass: pad lines to align pipes
-        for target_line, et_line in formatted_pairs:
-            padded_line = f"{target_line:<{max_length}}  |  {et_line}"
-            formatted.append(padded_line)
+        target_lines = [format_line(row, duration_width) for row in rows]
+        et_lines = [format_line(local_window(start, end, "America/New_York", is_extended), duration_width)
+                    for start, end, is_extended in windows]
+        max_length = max((len(line) for line in target_lines), default=0)
+        # Pad lines to align pipes
+        for target_line, et_line in zip(target_lines, et_lines):
+            formatted.append(f"{target_line:<{max_length}}  |  {et_line}")
     else:
-        # Group windows by date for better ordering
-        date_windows = {}
-        for start, end, is_extended in windows:
-            start = start.astimezone(target_timezone)
-            end = end.astimezone(target_timezone)
-            
-            date_key = start.date()
-            if date_key not in date_windows:
-                date_windows[date_key] = []
-            
-            # Store tuple with start time hour for sorting
-            date_windows[date_key].append((start, end, is_extended, start.hour))
-        
-        # Process dates in order
-        for date_key in sorted(date_windows.keys()):
-            windows_for_date = date_windows[date_key]
-            
-            # Sort by hour to ensure morning, work day, evening order
-            windows_for_date.sort(key=lambda x: x[3])
-            
-            # Check if we need to add a newline between weeks
-            current_week = date_key.isocalendar()[1]
-            if last_week is not None and current_week != last_week:
-                formatted.append("")  # Add empty string for newline
-            
-            # Format all windows for this date
-            for start, end, is_extended, _ in windows_for_date:
-                formatted.append(format_window(start, end, start.tzname(), is_extended))
-            
-            last_week = current_week  # Update last_week with current_week
+        # Order by date, then by start hour (morning, work day, evening), keeping ties in order
+        rows.sort(key=itemgetter(0, 1))
+        last_week = None
+        for row in rows:
+            week = row[3]
+            # Add a blank line between weeks
+            if last_week is not None and week != last_week:
+                formatted.append("")
+            formatted.append(format_line(row, duration_width))
+            last_week = week
+
+    return formatted
 
+@profiled('format')
+def format_group_windows(windows: List[Tuple[int, int, Tuple[str, ...]]],
+                         target_tz: str = "America/New_York",
+                         output_format: str = 'text') -> List[str]:
+    """Format find_group_windows results, naming the attendees missing from each near-miss."""
+    plain = [(start, end, False) for start, end, _ in windows]
+    if output_format != 'text':
+        records = window_records(plain, target_tz)
+        # window_records sorts by start, which find_group_windows output already is
+        for record, (_, _, missing) in zip(records, windows):
+            record['missing'] = list(missing)
+        if output_format == 'ndjson':
+            return [json.dumps(record) for record in records]
+        return [json.dumps(records, indent=2)]
+
+    # Lines come out in window order, with blank lines between weeks
+    missing = iter(missing for _, _, missing in windows)
+    formatted = []
+    for line in format_windows(plain, target_tz=target_tz):
+        if line:
+            without = next(missing)
+            if without:
+                line = f"{line} without {', '.join(without)}"
+        formatted.append(line)
     return formatted
 
+def format_timestamp(tz_name: str) -> str:
+    """Format the current time in tz_name as the last-checked line of an output directory."""
+    now = datetime.now(ZoneInfo(tz_name))
+    hour = now.strftime("%I").lstrip("0")
+    return f"cao {now.day:>2} {now.strftime('%b')} @ {hour:>2}:{now.strftime('%M')} {now.strftime('%p')}"
+
+# File extension of each --format under --output-dir
+OUTPUT_SUFFIXES = {'text': '.txt', 'json': '.json', 'ndjson': '.ndjson'}
+
+def render_output(busy: List[Tuple[int, int]], tz_name: str, window_args: dict,
+                  output_format: str = 'text', only: List[str] = None) -> str:
+    """Render the windows of one output file."""
+    windows = find_free_windows([], target_tz=tz_name, busy=busy, **window_args)
+    if only:
+        windows = filter_windows(windows, only, tz_name)
+    if output_format == 'text':
+        lines = format_windows(windows, target_tz=tz_name)
+    else:
+        lines = format_records(windows, target_tz=tz_name, output_format=output_format)
+    return "\n".join(lines) + "\n"
+
+# Bump whenever the manifest layout changes so an old one is treated as empty
+MANIFEST_VERSION = 2
+
+def read_manifest(path: Path) -> dict:
+    """Return the files recorded in an output manifest, or {} if it is missing or stale."""
+    try:
+        manifest = json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+@profiled('write')
+def write_outputs(events: List[Tuple[int, int, int]],
+                  output_dir: str,
+                  timezones: dict,
+                  modes: dict,
+                  buffer_mins: int = 30,
+                  workers: int = 1,
+                  manifest_path: str = None,
+                  output_format: str = 'text',
+                  only: List[str] = None) -> List[str]:
+    """Render every (timezone, mode) pair from a single event list.
+
+    timezones maps an abbreviation to an IANA timezone name, and modes maps an
+    output subdirectory to the keyword arguments for find_free_windows. Each
+    pair is written to <output_dir>/<subdir>/tz/<abbr>.txt, or .json/.ndjson
+    for those formats; only keeps the windows matching those --only tags.
+    For text, <output_dir>/<subdir>/checked.txt gets an "<abbr> cao ..."
+    line per timezone on every run, so the windows files hold no timestamp.
+
+    A manifest (<output_dir>.manifest.json, outside output_dir so it never
+    lists the subdirectories, unless manifest_path is given) records the
+    SHA-256 of each file, so a file is only replaced (atomically) when its
+    windows changed. Files from an earlier run that are no longer rendered
+    are removed. Returns the paths, relative to output_dir, that were
+    written or removed (never checked.txt).
+    """
+    # Busy times are the same for every output, so merge them only once
+    busy = merge_busy_times(events, buffer_mins)
+
+    jobs = []
+    for subdir, window_args in modes.items():
+        for abbr, tz_name in timezones.items():
+            jobs.append((Path(subdir) / 'tz' / f"{abbr}{OUTPUT_SUFFIXES[output_format]}", tz_name, window_args))
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_profiled, PROFILE is not None, render_output,
+                                       busy, tz_name, window_args, output_format, only)
+                       for _, tz_name, window_args in jobs]
+            contents = []
+            for future in futures:
+                content, profile = future.result()
+                merge_profile(profile)
+                contents.append(content)
+    else:
+        contents = [render_output(busy, tz_name, window_args, output_format, only) for _, tz_name, window_args in jobs]
+
+    output_dir = Path(output_dir)
+    # Resolved, so that -o . still puts these next to the directory rather than in it
+    resolved = output_dir.resolve()
+    manifest_path = Path(manifest_path) if manifest_path else resolved.with_name(f"{resolved.name}.manifest.json")
+    # Temp files stay out of the (published) output directory even if a run is killed mid-write
+    tmp_dir = resolved.parent
+    previous = read_manifest(manifest_path)
+    files = {}
+    changed = []
+    for (name, tz_name, _), content in zip(jobs, contents):
+        key = name.as_posix()
+        path = output_dir / name
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        entry = previous.get(key)
+        if entry and entry['sha256'] == digest and path.exists():
+            files[key] = entry
+            continue
+        print(f"writing {path} ({tz_name})", file=sys.stderr)
+        atomic_write(path, content, tmp_dir)
+        files[key] = {'sha256': digest, 'updated': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+        changed.append(key)
+
+    unchanged = len(jobs) - len(changed)
+    for key in sorted(previous.keys() - files.keys()):
+        print(f"removing {output_dir / key}", file=sys.stderr)
+        (output_dir / key).unlink(missing_ok=True)
+        changed.append(key)
+
+    if output_format == 'text':
+        # Rewritten on every run but left out of the manifest, so checking alone changes no windows file
+        checked = "".join(f"{abbr} {format_timestamp(tz_name)}\n" for abbr, tz_name in timezones.items())
+        for subdir in modes:
+            atomic_write(output_dir / subdir / 'checked.txt', checked, tmp_dir)
+
+    manifest = {'version': MANIFEST_VERSION,
+                'checked': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'files': files}
+    atomic_write(manifest_path, json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    print(f"[*] {len(changed)} outputs changed, {unchanged} unchanged", file=sys.stderr)
+    return changed
+
+# Bump whenever parse_calendar output changes so stale cache entries are ignored
+CACHE_VERSION = 2
+
+def cache_key(ical_data: str, *params) -> str:
+    """Key a parsed calendar by its content hash plus the parameters that shape the result."""
+    digest = hashlib.sha256(ical_data.encode('utf-8'))
+    digest.update(repr((CACHE_VERSION,) + params).encode('utf-8'))
+    return digest.hexdigest()
+
+def parse_calendar_cached(ical_data: str, cache_dir: str = None, **parse_args) -> List[Tuple[int, int, int]]:
+    """Parse iCal data, reusing the expanded events from cache_dir when the content is unchanged.
+
+    parse_args are passed to parse_calendar. The cache is bypassed without an
+    explicit start_date (the window would move on every run) and in verbose
+    mode (the debug tables come from parsing).
+    """
+    if not cache_dir or parse_args.get('start_date') is None or parse_args.get('verbose'):
+        return parse_calendar(ical_data, **parse_args)
+
+    # Holidays only feed the verbose table, so they are left out of the key
+    params = sorted((name, value) for name, value in parse_args.items() if not name.startswith('holiday_'))
+    path = Path(cache_dir) / f"{cache_key(ical_data, *params)}.pickle"
+    events = load_pickle(path, "cache entry")
+    if events is not None:
+        # Refresh mtime so eviction drops the least recently used entries first
+        os.utime(path)
+        return events
+
+    events = parse_calendar(ical_data, **parse_args)
+    atomic_write(path, pickle.dumps(events, protocol=pickle.HIGHEST_PROTOCOL))
+    return events
+
+def evict_cache(cache_dir: str, max_age_days: float = 7, max_size_mb: float = 100) -> None:
+    """Remove cache entries older than max_age_days, then the oldest until under max_size_mb.
+
+    Entries are the parse pickles (refreshed on every hit), the incremental
+    state (rewritten on every use) and the stored HTTP bodies, each body
+    going together with its ETag/Last-Modified file. The holiday and
+    timezone tables are small, not refreshed on use, and left alone.
+    """
+    # Parse pickles are named by a SHA-256 hex digest, so timezones-<year>.pickle is not matched
+    digest_name = '?' * 64 + '.pickle'
+    try:
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry)
+                   for pattern in (digest_name, f"state/{digest_name}")
+                   for entry in Path(cache_dir).glob(pattern)]
+        for entry in (Path(cache_dir) / 'http').glob('*.ics'):
+            meta_path = entry.with_suffix('.json')
+            size = entry.stat().st_size + (meta_path.stat().st_size if meta_path.exists() else 0)
+            entries.append((entry.stat().st_mtime, size, entry))
+    except FileNotFoundError:
+        return
+
+    cutoff = datetime.now().timestamp() - max_age_days * 86400
+    max_size = max_size_mb * 1024 * 1024
+    total_size = sum(size for _, size, _ in entries)
+
+    # Oldest first, so entries past the age limit and the size budget go together
+    for mtime, size, entry in sorted(entries, key=itemgetter(0)):
+        if mtime >= cutoff and total_size <= max_size:
+            break
+        entry.unlink(missing_ok=True)
+        if entry.suffix == '.ics':
+            entry.with_suffix('.json').unlink(missing_ok=True)
+        total_size -= size
+
+@profiled('read')
 def read_ical_from_file(file_path: str) -> str:
     """Read iCal data from a file."""
     return Path(file_path).read_text()
 
-def fetch_ical_from_url(url: str) -> str:
-    """Fetch iCal data from a URL."""
-    response = requests.get(url)
+# Bump whenever the layout of the .idx files changes
+INDEX_VERSION = 1
+
+def hint_day(value: bytes) -> int:
+    """Date ordinal of the YYYYMMDD at the start of an iCal date or date-time value, or None."""
+    try:
+        return datetime(int(value[:4]), int(value[4:6]), int(value[6:8])).toordinal()
+    except ValueError:
+        return None
+
+def vevent_hints(block: bytes) -> Tuple[int, int, int, bool]:
+    """Scan one raw VEVENT for (DTSTART day, RECURRENCE-ID day, UNTIL day, is_recurring).
+
+    Days are date ordinals, or None when missing or unreadable. UNTIL is None
+    for a series without one (COUNT-limited or endless).
+    """
+    dtstart = recurrence_id = until = None
+    recurring = False
+    unfolded = block.replace(b'\r\n ', b'').replace(b'\r\n\t', b'').replace(b'\n ', b'').replace(b'\n\t', b'')
+    for line in unfolded.splitlines():
+        name = line.split(b':', 1)[0].split(b';', 1)[0].upper()
+        if name == b'DTSTART':
+            dtstart = hint_day(line.rsplit(b':', 1)[-1])
+        elif name == b'RECURRENCE-ID':
+            recurrence_id = hint_day(line.rsplit(b':', 1)[-1])
+        elif name == b'RRULE':
+            position = line.upper().find(b'UNTIL=')
+            day = hint_day(line[position + 6:]) if position >= 0 else None
+            # Every RRULE needs an UNTIL for the series to be bounded
+            if not recurring:
+                until = day
+            elif until is not None and day is not None:
+                until = max(until, day)
+            else:
+                until = None
+            recurring = True
+    return dtstart, recurrence_id, until, recurring
+
+def index_ical_file(data) -> List[Tuple[int, int, int, int, int, bool]]:
+    """Find every VEVENT in raw iCal bytes: (begin, end offset, DTSTART, RECURRENCE-ID, UNTIL, is_recurring)."""
+    index = []
+    position = 0
+    while True:
+        begin = data.find(b'BEGIN:VEVENT', position)
+        if begin < 0:
+            break
+        end = data.find(b'END:VEVENT', begin)
+        if end < 0:
+            break
+        # Include the line ending
+        end = data.find(b'\n', end)
+        end = len(data) if end < 0 else end + 1
+        index.append((begin, end) + vevent_hints(data[begin:end]))
+        position = end
+    return index
+
+@profiled('read')
+def read_ical_window(file_path: str, start_date: datetime = None, days: int = 31) -> str:
+    """Read iCal data from a file, keeping only the VEVENTs that can fall in the search window.
+
+    The file is memory-mapped and scanned once for VEVENT offsets and their
+    DTSTART, RECURRENCE-ID and UNTIL dates; that index is saved as
+    <file_path>.idx and reused while the file's size and mtime are unchanged.
+    Everything outside VEVENTs (VTIMEZONEs and so on) is kept, as is any
+    VEVENT that might produce an occurrence in the window (with a day of
+    slack for timezones) or move one into or out of it.
+    """
+    import mmap
+
+    path = Path(file_path)
+    index_path = Path(f"{file_path}.idx")
+    stat = path.stat()
+    signature = (INDEX_VERSION, stat.st_size, stat.st_mtime_ns)
+    if stat.st_size == 0:
+        return ''
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        index = None
+        stored = load_pickle(index_path, "index")
+        if isinstance(stored, dict) and stored.get('signature') == signature:
+            index = stored.get('events')
+
+        if index is None:
+            index = index_ical_file(data)
+            try:
+                atomic_write(index_path, pickle.dumps({'signature': signature, 'events': index},
+                                                      protocol=pickle.HIGHEST_PROTOCOL))
+            except OSError as e:
+                print(f"Warning: Could not save index {index_path}: {e}", file=sys.stderr)
+
+        search_start = start_date if start_date else datetime.now(ZoneInfo("America/New_York"))
+        first = search_start.date().toordinal() - 1
+        last = (search_start + timedelta(days=days)).date().toordinal() + 1
+
+        def in_window(day):
+            return day is None or first <= day <= last
+
+        chunks = []
+        position = 0
+        kept = 0
+        for begin, end, dtstart, recurrence_id, until, recurring in index:
+            if recurrence_id is not None:
+                # An override matters where it moves an instance from as well as where it moves it to
+                keep = in_window(dtstart) or in_window(recurrence_id)
+            elif recurring:
+                keep = dtstart is None or (dtstart <= last and (until is None or until >= first))
+            else:
+                keep = in_window(dtstart)
+            chunks.append(data[position:end] if keep else data[position:begin])
+            kept += keep
+            position = end
+        chunks.append(data[position:])
+
+    if PROFILE is not None:
+        count('vevents_skipped', len(index) - kept)
+    return b''.join(chunks).decode('utf-8')
+
+def fetch_ical_from_url(url: str, session=None, store_dir: str = None, timeout: float = 30) -> str:
+    """Fetch iCal data from a URL.
+
+    With store_dir, the last response body is kept on disk along with its
+    ETag/Last-Modified, and later fetches send a conditional request so that
+    a 304 Not Modified reuses the stored body.
+    """
+    if session is None:
+        import requests
+        session = requests
+    headers = {}
+    body_path = meta_path = None
+
+    if store_dir:
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        body_path = Path(store_dir) / f"{name}.ics"
+        meta_path = Path(store_dir) / f"{name}.json"
+        try:
+            meta = json.loads(meta_path.read_text())
+            if body_path.exists():
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+        except (FileNotFoundError, ValueError):
+            pass
+
+    response = session.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and headers:
+        body = body_path.read_bytes().decode('utf-8')
+        # Refresh mtime so eviction drops the least recently used bodies first
+        os.utime(body_path)
+        return body
     response.raise_for_status()
+
+    if store_dir:
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            atomic_write(body_path, response.text.encode('utf-8'))
+            atomic_write(meta_path, json.dumps({'etag': etag, 'last_modified': last_modified}))
+
     return response.text
 
+@profiled('fetch')
+def fetch_calendars(urls: List[str],
+                    store_dir: str = None,
+                    timeout: float = 30,
+                    workers: int = 8,
+                    verbose: bool = False) -> List[str]:
+    """Fetch several iCal URLs concurrently over one keep-alive session, in input order."""
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    workers = max(1, min(workers, len(urls)))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    def fetch(url):
+        started = perf_counter()
+        ical_data = fetch_ical_from_url(url, session=session, store_dir=store_dir, timeout=timeout)
+        return ical_data, perf_counter() - started
+
+    with session, ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fetch, urls))
+
+    if verbose:
+        for url, (ical_data, elapsed) in zip(urls, results):
+            print(f"fetched {url} in {elapsed:.3f}s ({len(ical_data)} chars)", file=sys.stderr)
+
+    return [ical_data for ical_data, _ in results]
+
+def parse_source(source: str, ical_data: str = None, cache_dir: str = None, parse_args: dict = None,
+                 index: bool = True):
+    """Read (when ical_data is None, source is a file path) and parse one calendar into (events, elapsed).
+
+    With index, files are read through read_ical_window so that only the
+    VEVENTs near the search window are decoded.
+    """
+    started = perf_counter()
+    if ical_data is None and index:
+        parse_args = parse_args or {}
+        ical_data = read_ical_window(source, parse_args.get('start_date'), parse_args.get('days', 31))
+    elif ical_data is None:
+        ical_data = read_ical_from_file(source)
+    events = parse_calendar_cached(ical_data, cache_dir, **(parse_args or {}))
+    return events, perf_counter() - started
+
+def parse_source_logged(*args) -> Tuple[List[Tuple[int, int, int]], str, float]:
+    """parse_source for a pool worker, returning (events, log, elapsed).
+
+    Anything written to stderr while parsing is captured, so the parent can
+    replay the logs in source order. If parsing fails, the log is written
+    out before the error is re-raised.
+    """
+    log = io.StringIO()
+    try:
+        with redirect_stderr(log):
+            events, elapsed = parse_source(*args)
+    except BaseException:
+        sys.stderr.write(log.getvalue())
+        raise
+    return events, log.getvalue(), elapsed
+
+def load_sources(files: List[str] = None,
+                 urls: List[str] = None,
+                 cache_dir: str = None,
+                 fetch_workers: int = 8,
+                 timeout: float = 30,
+                 jobs: int = 1,
+                 index: bool = True,
+                 **parse_args) -> List[Tuple[str, List[Tuple[int, int, int]]]]:
+    """Read and parse every calendar source into (source, events) pairs, files first, in input order.
+
+    parse_args are passed to parse_calendar. With jobs > 1 the calendars are
+    parsed in a process pool; events and logs are still reported in source
+    order. index selects read_ical_window for files (see parse_source).
+    """
+    sources = [(file_path, None) for file_path in files or []]
+    if urls:
+        store_dir = str(Path(cache_dir) / 'http') if cache_dir else None
+        verbose = parse_args.get('verbose', False)
+        sources += list(zip(urls, fetch_calendars(urls, store_dir, timeout=timeout,
+                                                  workers=fetch_workers, verbose=verbose)))
+
+    parsed = []
+    if jobs > 1 and len(sources) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(jobs, len(sources))) as executor:
+            futures = [executor.submit(run_profiled, PROFILE is not None, parse_source_logged,
+                                       source, ical_data, cache_dir, parse_args, index)
+                       for source, ical_data in sources]
+            # Worker logs are replayed in source order, so they never interleave
+            for (source, _), future in zip(sources, futures):
+                (events, log, elapsed), profile = future.result()
+                merge_profile(profile)
+                print(f"reading {source}", file=sys.stderr)
+                sys.stderr.write(log)
+                print(f"parsed {source} in {elapsed:.3f}s ({len(events)} events)", file=sys.stderr)
+                parsed.append((source, events))
+    else:
+        for source, ical_data in sources:
+            print(f"reading {source}", file=sys.stderr)
+            events, elapsed = parse_source(source, ical_data, cache_dir, parse_args, index)
+            print(f"parsed {source} in {elapsed:.3f}s ({len(events)} events)", file=sys.stderr)
+            parsed.append((source, events))
+    return parsed
+
+def load_events(files: List[str] = None,
+                urls: List[str] = None,
+                cache_dir: str = None,
+                fetch_workers: int = 8,
+                timeout: float = 30,
+                jobs: int = 1,
+                index: bool = True,
+                **parse_args) -> List[Tuple[int, int, int]]:
+    """Read and parse every calendar source plus busy.txt into one event list."""
+    all_events = []
+    for _, events in load_sources(files, urls, cache_dir, fetch_workers, timeout, jobs, index, **parse_args):
+        all_events.extend(events)
+
+    # Add busy times from busy.txt if it exists
+    busy_events = parse_busy_file('busy.txt')
+    if busy_events:
+        print(f"reading busy.txt ({len(busy_events)} entries)", file=sys.stderr)
+        all_events.extend(busy_events)
+
+    return all_events
+
+def stream_events(files: List[str] = None,
+                  urls: List[str] = None,
+                  cache_dir: str = None,
+                  fetch_workers: int = 8,
+                  timeout: float = 30,
+                  start_date: datetime = None,
+                  days: int = 31,
+                  max_occurrences: int = 20000,
+                  max_calendar_occurrences: int = 200000,
+                  index: bool = True) -> Iterator[Tuple[int, int, int]]:
+    """Yield the events of every calendar source plus busy.txt, merged in start order.
+
+    Each source is expanded lazily by iter_calendar, so events are never
+    collected into one list. The parse cache is not used, and unlike
+    load_events there is no jobs, verbose or holidays argument.
+    """
+    if files:
+        read = (lambda file_path: read_ical_window(file_path, start_date, days)) if index else read_ical_from_file
+        sources = ((file_path, read(file_path)) for file_path in files)
+    elif urls:
+        store_dir = str(Path(cache_dir) / 'http') if cache_dir else None
+        sources = zip(urls, fetch_calendars(urls, store_dir, timeout=timeout, workers=fetch_workers))
+    else:
+        sources = ()
+
+    streams = []
+    for source, ical_data in sources:
+        print(f"reading {source}", file=sys.stderr)
+        streams.append(iter_calendar(ical_data, start_date, days, max_occurrences, max_calendar_occurrences))
+
+    # Add busy times from busy.txt if it exists
+    busy_events = sorted(parse_busy_file('busy.txt'))
+    if busy_events:
+        print(f"reading busy.txt ({len(busy_events)} entries)", file=sys.stderr)
+        streams.append(busy_events)
+
+    return heapq.merge(*streams)
+
+def load_attendees(path: str,
+                   work_start: time = time(10, 0),
+                   work_end: time = time(17, 0),
+                   holiday_country: str = 'US',
+                   holiday_subdiv: str = None) -> dict:
+    """Read an attendees JSON file into {name: settings}.
+
+    Each attendee maps to a list of calendars (files or URLs), or to an object
+    with "calendars" and optional "timezone", "start", "end" (HH:MM),
+    "holidays" and "holiday_subdiv". Missing settings fall back to ET and the
+    command-line work hours and holidays.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, dict) or not entries:
+        raise ValueError(f"{path} must map attendee names to their calendars")
+
+    attendees = {}
+    for name, entry in entries.items():
+        if isinstance(entry, list):
+            entry = {'calendars': entry}
+        unknown = set(entry) - {'calendars', 'timezone', 'start', 'end', 'holidays', 'holiday_subdiv'}
+        if unknown:
+            raise ValueError(f"unknown settings for {name}: {', '.join(sorted(unknown))}")
+        tz_name = entry.get('timezone', 'America/New_York')
+        ZoneInfo(tz_name)
+        attendees[name] = {
+            'calendars': list(entry.get('calendars', [])),
+            'timezone': tz_name,
+            'work_start': datetime.strptime(entry['start'], '%H:%M').time() if 'start' in entry else work_start,
+            'work_end': datetime.strptime(entry['end'], '%H:%M').time() if 'end' in entry else work_end,
+            'holidays': entry.get('holidays', holiday_country),
+            # A subdivision only carries over along with the country it belongs to
+            'holiday_subdiv': entry.get('holiday_subdiv', holiday_subdiv if 'holidays' not in entry else None),
+        }
+    return attendees
+
+def load_attendee_events(attendees: dict, **load_args) -> dict:
+    """Parse every attendee's calendars into {name: events}, reading shared calendars once.
+
+    busy.txt blocks the whole group, so its entries are added to everyone.
+    load_args are passed to load_sources (without files and urls).
+    """
+    calendars = list(dict.fromkeys(calendar for attendee in attendees.values() for calendar in attendee['calendars']))
+    urls = [calendar for calendar in calendars if calendar.startswith(('http://', 'https://'))]
+    files = [calendar for calendar in calendars if not calendar.startswith(('http://', 'https://'))]
+    parsed = dict(load_sources(files, urls, **load_args))
+
+    busy_events = parse_busy_file('busy.txt')
+    if busy_events:
+        print(f"reading busy.txt ({len(busy_events)} entries)", file=sys.stderr)
+    return {name: [event for calendar in attendee['calendars'] for event in parsed[calendar]] + busy_events
+            for name, attendee in attendees.items()}
+
+def serve_availability(load_args: dict,
+                       window_args: dict,
+                       buffer_mins: int = 30,
+                       days: int = 91,
+                       host: str = '127.0.0.1',
+                       port: int = 8080,
+                       refresh: float = 300) -> None:
+    """Serve free windows over HTTP from calendars parsed once and refreshed in the background.
+
+    GET /free?tz=&extended=&start=&end=&min_duration=&only=&format= runs
+    find_free_windows and format_windows (or format_records for format=json
+    or ndjson) against the in-memory busy set. start and end are
+    YYYY-MM-DD dates within the loaded horizon (days from the load start,
+    which is --start-date or yesterday). Responses are cached per parameter
+    set until the next refresh.
+    """
+    import asyncio
+    from urllib.parse import urlsplit, parse_qs
+
+    et_tz = ZoneInfo("America/New_York")
+    state = {'busy': None, 'start': None, 'responses': {}}
+
+    def load():
+        start_date = load_args.get('start_date')
+        if start_date is None:
+            yesterday = datetime.now(et_tz) - timedelta(days=1)
+            start_date = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
+        events = load_events(**dict(load_args, start_date=start_date, days=days))
+        return start_date, merge_busy_times(events, buffer_mins)
+
+    def answer(params):
+        tz_name = params.get('tz', 'America/New_York')
+        try:
+            ZoneInfo(tz_name)
+        except (ValueError, KeyError, OSError):
+            raise ValueError(f"unknown timezone: {tz_name}")
+        extended = params.get('extended', '0').lower() in ('1', 'true', 'yes')
+        start_date = state['start']
+        if 'start' in params:
+            start_date = datetime.strptime(params['start'], '%Y-%m-%d').replace(tzinfo=et_tz)
+        end_date = state['start'] + timedelta(days=days)
+        if 'end' in params:
+            end_date = datetime.strptime(params['end'], '%Y-%m-%d').replace(tzinfo=et_tz)
+        if start_date < state['start'] or end_date > state['start'] + timedelta(days=days) or end_date <= start_date:
+            raise ValueError(f"start and end must be within {state['start'].date()} and "
+                             f"{(state['start'] + timedelta(days=days)).date()}")
+        min_duration = int(params.get('min_duration', window_args.get('min_duration', 30)))
+        only = params['only'].split(',') if params.get('only') else []
+        output_format = params.get('format', 'text')
+        if output_format not in ('text', 'json', 'ndjson'):
+            raise ValueError(f"unknown format: {output_format}")
+
+        key = (tz_name, extended, start_date, end_date, min_duration, tuple(only), output_format)
+        if key not in state['responses']:
+            windows = find_free_windows([], **dict(window_args,
+                                                   busy=state['busy'],
+                                                   target_tz=tz_name,
+                                                   extended=extended,
+                                                   start_date=start_date,
+                                                   days=(end_date - start_date).days,
+                                                   min_duration=min_duration,
+                                                   state_dir=None))
+            if only:
+                windows = filter_windows(windows, only, tz_name)
+            if output_format == 'text':
+                lines = format_windows(windows, target_tz=tz_name)
+            else:
+                lines = format_records(windows, target_tz=tz_name, output_format=output_format)
+            state['responses'][key] = "\n".join(lines) + "\n"
+        return state['responses'][key]
+
+    async def refresh_loop():
+        while True:
+            await asyncio.sleep(refresh)
+            started = perf_counter()
+            try:
+                state['start'], state['busy'] = await asyncio.to_thread(load)
+                state['responses'] = {}
+                print(f"refreshed calendars in {perf_counter() - started:.3f}s", file=sys.stderr)
+            except Exception as e:
+                print(f"Error: refresh failed, keeping previous calendars: {e}", file=sys.stderr)
+
+    async def handle(reader, writer):
+        status, body = '200 OK', ''
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                status, body = '405 Method Not Allowed', 'only GET is supported\n'
+            else:
+                url = urlsplit(request_line[1])
+                if url.path != '/free':
+                    status, body = '404 Not Found', 'not found\n'
+                else:
+                    params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                    try:
+                        body = answer(params)
+                    except ValueError as e:
+                        status, body = '400 Bad Request', f"{e}\n"
+        except Exception as e:
+            status, body = '500 Internal Server Error', f"{e}\n"
+
+        payload = body.encode('utf-8')
+        writer.write(f"HTTP/1.1 {status}\r\n"
+                     f"Content-Type: text/plain; charset=utf-8\r\n"
+                     f"Content-Length: {len(payload)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def run():
+        state['start'], state['busy'] = load()
+        server = await asyncio.start_server(handle, host, port)
+        print(f"serving on http://{host}:{port}/free", file=sys.stderr)
+        async with server:
+            await asyncio.gather(server.serve_forever(), refresh_loop())
+
+    asyncio.run(run())
+
+def watch_outputs(load_args: dict,
+                  output_dir: str,
+                  timezones: dict,
+                  modes: dict,
+                  buffer_mins: int = 30,
+                  workers: int = 1,
+                  refresh: float = 300,
+                  poll: float = 2,
+                  debounce: float = 1,
+                  manifest_path: str = None,
+                  output_format: str = 'text',
+                  only: List[str] = None) -> None:
+    """Stay resident and rewrite the --output-dir files whenever an input's content changes.
+
+    URLs are fetched every refresh seconds (conditionally, through the HTTP
+    store in the cache), and calendar files and busy.txt are stat-polled
+    every poll seconds; a file whose stat changed is read once it has been
+    quiet for debounce seconds. Only sources whose content hash changed are
+    parsed again, and the outputs are written only when some hash changed or
+    the search window moved to a new day. A failed parse or write keeps the
+    previous outputs and is retried once the content changes again, or after
+    refresh seconds. Runs until interrupted.
+    """
+    load_args = dict(load_args)
+    files = load_args.pop('files') or []
+    urls = load_args.pop('urls') or []
+    cache_dir = load_args.pop('cache_dir', None)
+    fetch_workers = load_args.pop('fetch_workers', 8)
+    timeout = load_args.pop('timeout', 30)
+    index = load_args.pop('index', True)
+    load_args.pop('jobs', None)
+    store_dir = str(Path(cache_dir) / 'http') if cache_dir else None
+    horizon = max(mode['days'] for mode in modes.values())
+    et_tz = ZoneInfo("America/New_York")
+    inputs = files + urls + ['busy.txt']
+
+    texts = {}     # URL -> last fetched body
+    digests = {}   # input -> content hash of its latest fetched or settled content
+    hashes = {}    # input -> content hash of what was last parsed into outputs
+    events = {}    # input -> parsed events
+    stats = {}     # file -> (mtime_ns, size) at the last poll
+    pending = {}   # file -> when its stat last changed
+    current_start = None
+    next_fetch = 0.0
+    failed = None  # (digests, start date) of the last failed regeneration
+    retry_at = 0.0
+
+    def signature(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def content_hash(path):
+        try:
+            return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    def parse(source, start_date):
+        if source == 'busy.txt':
+            return parse_busy_file(source)
+        parse_args = dict(load_args, start_date=start_date, days=horizon)
+        source_events, elapsed = parse_source(source, texts.get(source), cache_dir, parse_args, index)
+        print(f"parsed {source} in {elapsed:.3f}s ({len(source_events)} events)", file=sys.stderr)
+        return source_events
+
+    print(f"watching {len(files) + 1} files and {len(urls)} URLs", file=sys.stderr)
+    try:
+        while True:
+            tick = monotonic()
+            start_date = load_args.get('start_date')
+            if start_date is None:
+                yesterday = datetime.now(et_tz) - timedelta(days=1)
+                start_date = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
+            new_day = start_date != current_start
+
+            if urls and tick >= next_fetch:
+                next_fetch = tick + refresh
+                try:
+                    bodies = fetch_calendars(urls, store_dir, timeout=timeout, workers=fetch_workers)
+                except Exception as e:
+                    print(f"Warning: fetch failed, keeping previous calendars: {e}", file=sys.stderr)
+                    bodies = [texts.get(url) for url in urls]
+                for url, body in zip(urls, bodies):
+                    if body is None:
+                        continue
+                    texts[url] = body
+                    digests[url] = hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+            for path in files + ['busy.txt']:
+                path_signature = signature(path)
+                if path_signature != stats.get(path):
+                    stats[path] = path_signature
+                    pending[path] = tick
+            for path, since in list(pending.items()):
+                # Wait for writes to settle before reading, unless everything is reparsed anyway
+                if new_day or tick - since >= debounce:
+                    del pending[path]
+                    digests[path] = content_hash(path)
+
+            # Digests are only recorded in hashes once they made it into the outputs, so a
+            # failed parse or write is retried instead of looking unchanged on the next poll
+            if new_day:
+                changed = {source for source in inputs if source in texts or source not in urls}
+            else:
+                changed = {source for source in digests if digests[source] != hashes.get(source)}
+            # After a failure, wait for new content or the next refresh before retrying
+            if failed == (digests, start_date) and tick < retry_at:
+                changed = set()
+
+            # Never write outputs while a calendar has not been fetched yet
+            if changed and all(url in texts for url in urls):
+                started = perf_counter()
+                try:
+                    for source in inputs:
+                        if source in changed:
+                            events[source] = parse(source, start_date)
+                    all_events = [event for source in inputs for event in events.get(source, ())]
+                    write_outputs(all_events, output_dir, timezones,
+                                  {subdir: dict(mode, start_date=start_date) for subdir, mode in modes.items()},
+                                  buffer_mins=buffer_mins, workers=workers, manifest_path=manifest_path,
+                                  output_format=output_format, only=only)
+                    reason = 'new day' if new_day else ', '.join(source for source in inputs if source in changed)
+                    print(f"[*] regenerated outputs in {perf_counter() - started:.3f}s ({reason})", file=sys.stderr)
+                    hashes.update((source, digests.get(source)) for source in changed)
+                    current_start = start_date
+                    failed = None
+                except Exception as e:
+                    print(f"Error: regeneration failed, keeping previous outputs: {e}", file=sys.stderr)
+                    failed = (dict(digests), start_date)
+                    retry_at = tick + refresh
+
+            sleep(max(0.0, poll - (monotonic() - tick)))
+    except KeyboardInterrupt:
+        pass
+
+# Timezones rendered by --output-dir (abbreviation -> IANA timezone)
+DEFAULT_TIMEZONES = {
+    'et': 'America/New_York',
+    'ct': 'America/Chicago',
+    'mt': 'America/Denver',
+    'pt': 'America/Los_Angeles',
+    'akt': 'America/Anchorage',
+    'hst': 'Pacific/Honolulu',
+    'gmt': 'Europe/London',
+    'cet': 'Europe/Paris',
+    'ist': 'Asia/Kolkata',
+    'jst': 'Asia/Tokyo',
+    'aet': 'Australia/Sydney',
+    'utc': 'UTC',
+}
+
+# --exit-code status when --output-dir left every file as it was (1 is an error)
+UNCHANGED_EXIT = 3
+
 def main():
+    global PROFILE
+
     parser = argparse.ArgumentParser(description='Cross-reference multiple calendars to find free time slots')
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('-f', '--files', nargs='+', help='Path to one or more iCal files')
     group.add_argument('-u', '--urls', nargs='+', help='URLs to fetch iCal data from')
     group.add_argument('-l', '--list-timezones', action='store_true', 
                       help='List all available timezones')
+    group.add_argument('-a', '--attendees', metavar='FILE',
+                      help='JSON file mapping attendee names to their calendars (and optional timezone, '
+                           'start, end, holidays) to find times when they are all free')
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose debug output')
     parser.add_argument('-t', '--timezone', default='America/New_York',
                       help='Target timezone for output (default: America/New_York)')
@@ -711,47 +2374,168 @@ def main():
                        help='Start time for extended hours in HH:MM format (default: 07:00)')
     parser.add_argument('--ext-end', type=str, default='20:00',
                        help='End time for extended hours in HH:MM format (default: 20:00)')
+    parser.add_argument('--all-but', type=int, default=0, metavar='K',
+                       help='With --attendees, also list times when all but K attendees are free (default: 0)')
     parser.add_argument('--buffer', type=int, default=30,
                        help='Buffer time in minutes to add before and after busy events (default: 30)')
     parser.add_argument('--min-duration', type=int, default=30,
                        help='Minimum duration in minutes for free windows (default: 30)')
+    parser.add_argument('--next', type=int, metavar='N',
+                       help='Only find the next N free windows, expanding recurring events no further than needed to find them')
+    parser.add_argument('--duration', type=int, metavar='M',
+                       help='With --next, minimum length in minutes of each window (default: --min-duration)')
     parser.add_argument('--days', type=int, default=31,
                        help='Number of days to look ahead for free windows (default: 31)')
+    parser.add_argument('--holidays', default='US', metavar='COUNTRY',
+                       help='Country code whose public holidays are excluded (default: US)')
+    parser.add_argument('--holiday-subdiv', metavar='SUBDIV',
+                       help='Subdivision (state, province, ...) of --holidays to include')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                       help='Number of worker processes for parsing calendars (default: 1)')
+    parser.add_argument('--max-occurrences', type=int, default=20000,
+                       help='Stop expanding a recurring event after this many occurrences (default: 20000)')
+    parser.add_argument('--max-calendar-occurrences', type=int, default=200000,
+                       help='Stop reading each calendar after this many events; the limit applies per calendar (default: 200000)')
+    parser.add_argument('--stream', action='store_true',
+                       help='Expand and merge events lazily in start order instead of collecting them (skips the parse cache)')
+    parser.add_argument('--backend', choices=['interval', 'numpy'], default='interval',
+                       help='Engine for removing busy times; numpy needs numpy installed (default: interval)')
+    parser.add_argument('--format', choices=['text', 'json', 'ndjson'], default='text',
+                       help='Output format; json and ndjson records have UTC start/end, duration and tags (default: text)')
+    parser.add_argument('--only', metavar='TAGS',
+                       help='Comma-separated tags to keep: morn, dytm, even (time of day) and wkdy, wknd (day of week)')
+    parser.add_argument('--profile', action='store_true',
+                       help='Report wall time and call counts per stage plus item counters on stderr')
+    parser.add_argument('--profile-output', metavar='PATH',
+                       help='With --profile, write JSON (or a Prometheus textfile if PATH ends in .prom) instead')
+    parser.add_argument('--serve', action='store_true',
+                       help='Serve /free?tz=&extended=&start=&end=&min_duration=&only=&format= over HTTP instead of printing')
+    parser.add_argument('--host', default='127.0.0.1',
+                       help='Address to listen on with --serve (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080,
+                       help='Port to listen on with --serve (default: 8080)')
+    parser.add_argument('--refresh', type=float, default=300,
+                       help='Seconds between calendar refreshes with --serve or URL polls with --watch (default: 300)')
+    parser.add_argument('--watch', action='store_true',
+                       help='With --output-dir, stay running and rewrite the outputs whenever a calendar or busy.txt changes')
+    parser.add_argument('--poll', type=float, default=2,
+                       help='Seconds between checks of local files with --watch (default: 2)')
+    parser.add_argument('--debounce', type=float, default=1,
+                       help='Seconds a changed file must stay unchanged before --watch reads it (default: 1)')
+    parser.add_argument('--busy-index', metavar='PATH',
+                       help='Also save the merged, buffered busy times to PATH for is_free, overlaps and free_between '
+                            'queries from other processes (see load_busy_index)')
+    parser.add_argument('-o', '--output-dir',
+                       help='Render every timezone and mode into OUTPUT_DIR/[EXT_SUBDIR/]tz/<abbr>.txt (.json, .ndjson with --format) '
+                            'from a single parse')
+    parser.add_argument('--timezones', nargs='+', metavar='ABBR=TIMEZONE',
+                       help='Timezones to render with --output-dir (default: et, ct, mt, pt, akt, hst, gmt, cet, ist, jst, aet, utc)')
+    parser.add_argument('--modes', nargs='+', choices=['regular', 'extended'], default=['regular'],
+                       help='Modes to render with --output-dir (default: regular)')
+    parser.add_argument('--ext-subdir', default='ext',
+                       help='Subdirectory of --output-dir for extended mode (default: ext)')
+    parser.add_argument('--ext-days', type=int, default=91,
+                       help='Number of days to look ahead in extended mode (default: 91)')
+    parser.add_argument('--manifest', metavar='PATH',
+                       help='Where --output-dir keeps the content hashes of its files (default: OUTPUT_DIR.manifest.json)')
+    parser.add_argument('--exit-code', action='store_true',
+                       help=f'With --output-dir, exit with status {UNCHANGED_EXIT} if no output file changed')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Number of worker processes for rendering with --output-dir (default: 1)')
+    parser.add_argument('--fetch-workers', type=int, default=8,
+                       help='Maximum number of URLs to fetch concurrently (default: 8)')
+    parser.add_argument('--timeout', type=float, default=30,
+                       help='Timeout in seconds for each URL fetch (default: 30)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Keep per-day results in the cache and only recompute days whose busy times changed')
+    parser.add_argument('--cache-dir', default='.cache',
+                       help='Directory for cached parsed calendars and fetched URLs (default: .cache)')
+    parser.add_argument('--no-index', action='store_true',
+                       help='Decode whole files instead of only the events near the search window (indexed in <file>.idx)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always fetch and parse calendars instead of using the cache')
+    parser.add_argument('--cache-max-age', type=float, default=7,
+                       help='Evict cached calendars unused for this many days (default: 7)')
+    parser.add_argument('--cache-max-size', type=float, default=100,
+                       help='Evict the oldest cached calendars above this many MB (default: 100)')
 
     args = parser.parse_args()
 
+    # Check flag combinations up front, since each mode below returns early
+    if args.watch and not args.output_dir:
+        parser.error("--watch needs --output-dir")
+    if args.timezones and not args.output_dir:
+        parser.error("--timezones needs --output-dir")
+    for entry in args.timezones or []:
+        abbr, sep, tz_name = entry.partition('=')
+        if not abbr or not sep:
+            parser.error(f"--timezones entries look like ABBR=TIMEZONE, not {entry!r}")
+        try:
+            ZoneInfo(tz_name)
+        except (ValueError, KeyError, OSError):
+            parser.error(f"--timezones: unknown timezone {tz_name!r} for {abbr}")
+    if args.serve and (args.output_dir or args.attendees):
+        parser.error("--serve cannot be used with --output-dir or --attendees")
+    if args.all_but and not args.attendees:
+        parser.error("--all-but needs --attendees")
+    if args.attendees:
+        # Read now (and again with the work hours below) so a bad --all-but fails before any fetching
+        try:
+            attendee_count = len(load_attendees(args.attendees))
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"--attendees: {e}")
+        if not 0 <= args.all_but < attendee_count:
+            parser.error(f"--all-but must be between 0 and {attendee_count - 1} for {attendee_count} attendees")
+    if args.attendees and (args.extended or args.strict or args.only):
+        parser.error("--attendees uses each attendee's own working hours; drop --extended, --strict or --only")
+    # --next streams the events too
+    for flag, streaming in (('--stream', args.stream), ('--next', args.next is not None)):
+        if streaming and (args.jobs > 1 or args.verbose):
+            parser.error(f"{flag} parses in one process without the debug tables; drop --jobs or --verbose")
+        if streaming and (args.incremental or args.backend == 'numpy'):
+            parser.error(f"{flag} cannot be used with --incremental or --backend numpy, which need every event at once")
+    if args.stream and (args.output_dir or args.busy_index or args.serve or args.attendees):
+        parser.error("--stream cannot be used with --output-dir, --busy-index, --serve or --attendees, "
+                     "which need every event at once")
+    if args.next is not None and args.next < 1:
+        parser.error("--next must be at least 1")
+    if args.duration is not None and args.next is None:
+        parser.error("--duration needs --next")
+    if args.next is not None and (args.output_dir or args.serve or args.attendees):
+        parser.error("--next cannot be used with --output-dir, --serve or --attendees")
+    if args.busy_index and (args.serve or args.attendees or args.watch or args.next is not None):
+        parser.error("--busy-index cannot be used with --serve, --attendees, --watch or --next")
+
+    # Stages that run in worker processes (--jobs, --workers) are merged in through run_profiled
+    if args.profile:
+        PROFILE = {'stages': {}, 'counters': {}}
+        main_started = perf_counter()
+
     work_start = datetime.strptime(args.start, '%H:%M').time()
     work_end = datetime.strptime(args.end, '%H:%M').time()
     ext_start = datetime.strptime(args.ext_start, '%H:%M').time()
     ext_end = datetime.strptime(args.ext_end, '%H:%M').time()
 
+    cache_dir = None if args.no_cache else args.cache_dir
+
     # Add timezone listing logic
     if args.list_timezones:
-        now = datetime.now()
-        # Create list of (timezone, offset) tuples
-        tz_info = []
-        for tz_name in available_timezones():
-            try:
-                tz = ZoneInfo(tz_name)
-                offset = datetime.now(tz).utcoffset()
-                # Convert offset to hours
-                offset_hours = offset.total_seconds() / 3600
-                tz_info.append((tz_name, offset_hours))
-            except Exception:
-                continue
+        # (timezone, offset) tuples from the cached offset tables
+        tz_info = timezone_offsets(cache_dir)
 
         # Sort by offset first, then by name
         tz_info.sort(key=itemgetter(1, 0))
 
         print("\nAvailable timezones (sorted by offset):")
-        for tz_name, offset_hours in tz_info:
+        for tz_name, offset in tz_info:
             # Format offset as ±HH:MM
-            hours = int(abs(offset_hours))
-            minutes = int((abs(offset_hours) * 60) % 60)
-            sign = '-' if offset_hours < 0 else '+'
+            hours, minutes = divmod(abs(offset) // 60, 60)
+            sign = '-' if offset < 0 else '+'
             offset_str = f"{sign}{hours:02d}:{minutes:02d}"
             print(f"  UTC{offset_str}  {tz_name}")
         return
+    # Passed down explicitly, since pool workers do not see globals set here
+    holiday_cache_dir = str(Path(cache_dir) / 'holidays') if cache_dir else None
 
     try:
         # Parse start date if provided
@@ -761,51 +2545,148 @@ def main():
             start_date = datetime.strptime(args.start_date, '%Y-%m-%d')
             start_date = start_date.replace(tzinfo=et_tz)
 
-        # New code to handle multiple calendars
-        all_events = []
-
-        if args.files:
-            for file_path in args.files:
-                print(f"reading {file_path}", file=sys.stderr)
-                ical_data = read_ical_from_file(file_path)
-                events = parse_calendar(ical_data, verbose=args.verbose, start_date=start_date, days=args.days)
-                all_events.extend(events)
-        elif args.urls:
-            for url in args.urls:
-                ical_data = fetch_ical_from_url(url)
-                events = parse_calendar(ical_data, verbose=args.verbose, start_date=start_date, days=args.days)
-                all_events.extend(events)
-
-        # Add busy times from busy.txt if it exists
-        busy_events = parse_busy_file('busy.txt')
-        if busy_events:
-            print(f"reading busy.txt ({len(busy_events)} entries)", file=sys.stderr)
-            all_events.extend(busy_events)
-
-        free_times = format_windows(
-            find_free_windows(
+        load_args = dict(
+            files=args.files,
+            urls=args.urls,
+            cache_dir=cache_dir,
+            fetch_workers=args.fetch_workers,
+            timeout=args.timeout,
+            jobs=args.jobs,
+            verbose=args.verbose,
+            start_date=start_date,
+            holiday_country=args.holidays,
+            holiday_subdiv=args.holiday_subdiv,
+            holiday_cache_dir=holiday_cache_dir,
+            max_occurrences=args.max_occurrences,
+            max_calendar_occurrences=args.max_calendar_occurrences,
+            index=not args.no_index
+        )
+
+        window_args = dict(
+            min_duration=args.min_duration,
+            backend=args.backend,
+            holiday_country=args.holidays,
+            holiday_subdiv=args.holiday_subdiv,
+            holiday_cache_dir=holiday_cache_dir,
+            state_dir=str(Path(cache_dir) / 'state') if args.incremental and cache_dir else None,
+            start_date=start_date,
+            strict=args.strict,
+            work_start=work_start,
+            work_end=work_end,
+            ext_start=ext_start,
+            ext_end=ext_end,
+            verbose=args.verbose
+        )
+        # A single streaming pass (--stream, --next) has no pool, debug tables or stored state
+        stream_args = {key: value for key, value in load_args.items()
+                       if key not in ('jobs', 'verbose', 'holiday_country', 'holiday_subdiv', 'holiday_cache_dir')}
+
+        if args.serve:
+            serve_availability(load_args, window_args, buffer_mins=args.buffer, days=args.days,
+                               host=args.host, port=args.port, refresh=args.refresh)
+            return
+
+        if args.attendees:
+            attendees = load_attendees(args.attendees, work_start, work_end, args.holidays, args.holiday_subdiv)
+            group_load_args = {key: value for key, value in load_args.items() if key not in ('files', 'urls')}
+            events = load_attendee_events(attendees, days=args.days, **group_load_args)
+            windows = find_group_windows(attendees, events, buffer_mins=args.buffer, start_date=start_date,
+                                         days=args.days, min_duration=args.min_duration, all_but=args.all_but,
+                                         holiday_cache_dir=holiday_cache_dir)
+            for line in format_group_windows(windows, target_tz=args.timezone, output_format=args.format):
+                print(line)
+            return
+
+        def save_index(busy, days):
+            # Covers the span the events were expanded for
+            now = start_date if start_date else datetime.now(ZoneInfo("America/New_York"))
+            index = build_busy_index(busy, epoch(now), epoch(now + timedelta(days=days)), args.buffer)
+            save_busy_index(args.busy_index, index)
+            print(f"writing {args.busy_index} ({len(busy)} busy intervals)", file=sys.stderr)
+
+        if args.output_dir:
+            only = args.only.split(',') if args.only else None
+            timezones = DEFAULT_TIMEZONES
+            if args.timezones:
+                timezones = dict(tz.split('=', 1) for tz in args.timezones)
+            modes = {}
+            if 'regular' in args.modes:
+                modes[''] = dict(window_args, extended=False, days=args.days)
+            if 'extended' in args.modes:
+                modes[args.ext_subdir] = dict(window_args, extended=True, days=args.ext_days)
+
+            if args.watch:
+                watch_outputs(load_args, args.output_dir, timezones, modes, buffer_mins=args.buffer,
+                              workers=args.workers, refresh=args.refresh, poll=args.poll, debounce=args.debounce,
+                              manifest_path=args.manifest, output_format=args.format, only=only)
+                return
+
+            # Parse once for the longest horizon; shorter modes ignore the extra events
+            horizon = max(mode['days'] for mode in modes.values())
+            all_events = load_events(days=horizon, **load_args)
+            if args.busy_index:
+                save_index(merge_busy_times(all_events, args.buffer), horizon)
+            changed = write_outputs(all_events, args.output_dir, timezones, modes, buffer_mins=args.buffer,
+                                    workers=args.workers, manifest_path=args.manifest,
+                                    output_format=args.format, only=only)
+            if args.exit_code and not changed:
+                sys.exit(UNCHANGED_EXIT)
+            return
+
+        if args.next is not None:
+            # Events are expanded in start order only until the next N windows are found
+            next_args = {key: value for key, value in window_args.items()
+                         if key not in ('backend', 'state_dir', 'verbose')}
+            windows = next_free_windows(
+                stream_events(days=args.days, **stream_args),
+                args.next,
+                buffer_mins=args.buffer,
+                target_tz=args.timezone,
+                extended=args.extended,
+                days=args.days,
+                only=args.only.split(',') if args.only else None,
+                **dict(next_args, min_duration=args.min_duration if args.duration is None else args.duration)
+            )
+        else:
+            if args.stream:
+                # Busy times are merged on the fly as the events arrive in start order
+                all_events = []
+                busy = stream_busy_times(stream_events(days=args.days, **stream_args), args.buffer)
+            else:
+                # New code to handle multiple calendars
+                all_events = load_events(days=args.days, **load_args)
+                busy = merge_busy_times(all_events, args.buffer) if args.busy_index else None
+            if args.busy_index:
+                save_index(busy, args.days)
+
+            windows = find_free_windows(
                 all_events,  # Use combined events from all calendars
                 buffer_mins=args.buffer,
-                min_duration=args.min_duration,
-                start_date=start_date,
                 target_tz=args.timezone,
-                strict=args.strict,
-                work_start=work_start,
-                work_end=work_end,
                 extended=args.extended,
-                ext_start=ext_start,
-                ext_end=ext_end,
-                days=args.days
-            ),
-            target_tz=args.timezone,
-            compare=args.compare
-        )
+                days=args.days,
+                busy=busy,
+                **window_args
+            )
+            if args.only:
+                windows = filter_windows(windows, args.only.split(','), args.timezone)
+
+        if args.format == 'text':
+            free_times = format_windows(windows, target_tz=args.timezone, compare=args.compare)
+        else:
+            free_times = format_records(windows, target_tz=args.timezone, output_format=args.format)
         for time in free_times:
             print(time)
 
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if cache_dir:
+            evict_cache(cache_dir, max_age_days=args.cache_max_age, max_size_mb=args.cache_max_size)
+        if PROFILE is not None:
+            PROFILE['stages']['total'] = (perf_counter() - main_started, 1)
+            report_profile(args.profile_output)
 
 if __name__ == '__main__':
     main()